@@ -5,9 +5,12 @@
 """
 
 import os
+import re
 import sys
 import argparse
 import json
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # 添加项目根目录到Python路径
@@ -15,107 +18,202 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
 sys.path.insert(0, project_root)
 
-# 先确认crash_handler模块存在
 try:
-    from waf_monitor import crash_handler
+    import orjson
 except ImportError:
-    # 处理crash_handler模块不存在的情况
-    print("错误: 无法导入crash_handler模块。")
-    # 检查模块文件是否存在
-    crash_handler_path = os.path.join(project_root, 'waf_monitor', 'crash_handler.py')
-    if not os.path.exists(crash_handler_path):
-        print(f"模块文件不存在: {crash_handler_path}")
-        print("请确保waf_monitor目录下存在crash_handler.py文件")
-    else:
-        print(f"模块文件存在但无法导入，可能存在语法错误或依赖问题: {crash_handler_path}")
-        print("尝试手动导入模块以查看具体错误...")
-        try:
-            # 尝试获取更具体的导入错误
-            import waf_monitor
-            print(f"已成功导入waf_monitor包，但无法导入crash_handler模块")
-            print(f"可用模块: {dir(waf_monitor)}")
-        except Exception as import_err:
-            print(f"导入waf_monitor包失败: {import_err}")
-    sys.exit(1)
+    orjson = None
+
+# 崩溃文件名格式: crash_YYYYMMDD_HHMMSS_<崩溃类型>.json
+_CRASH_NAME_RE = re.compile(r'^[^_]+_(\d{8})_(\d{6})_(.+)\.json$')
 
+# 崩溃报告的固定标题行
+_REPORT_RULE = "=" * 80
+_REPORT_TITLE = " " * 30 + "崩溃报告详情"
 
-def list_crashes(group_name):
+
+@functools.lru_cache(maxsize=32)
+def _scan_crash_files(crash_dir, mtime_ns):
     """
-    列出指定组的所有崩溃记录
+    扫描崩溃记录目录，返回按时间倒序排列的崩溃文件名
+    
+    @param {str} crash_dir - 崩溃记录目录
+    @param {int} mtime_ns - 目录修改时间，仅作为缓存失效的键
+    @returns {tuple} 崩溃文件名元组，最新的在前面
+    """
+    with os.scandir(crash_dir) as entries:
+        crash_files = [entry.name for entry in entries
+                       if entry.name.endswith('.json') and entry.is_file()]
+    crash_files.sort(reverse=True)
+    return tuple(crash_files)
+
+
+def _load_sorted_crashes(crash_dir):
+    """
+    获取排序后的崩溃文件列表，目录未变化时复用上次的扫描结果
+    
+    @param {str} crash_dir - 崩溃记录目录
+    @returns {tuple|None} 崩溃文件名元组，目录不存在则返回None
+    """
+    try:
+        mtime_ns = os.stat(crash_dir).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _scan_crash_files(crash_dir, mtime_ns)
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_crash_file(crash_path, mtime_ns):
+    """
+    解析崩溃记录文件
+    
+    @param {str} crash_path - 崩溃记录文件路径
+    @param {int} mtime_ns - 文件修改时间，仅作为缓存失效的键
+    @returns {dict} 崩溃数据
+    """
+    # 以二进制方式一次读取整个文件，由JSON解析器直接处理UTF-8字节
+    with open(crash_path, 'rb') as f:
+        content = f.read()
+    
+    # 优先使用orjson解析，未安装时回退到标准库json
+    if orjson:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _load_crash_data(crash_path):
+    """
+    读取崩溃记录文件，文件未变化时复用已解析的结果
+    
+    @param {str} crash_path - 崩溃记录文件路径
+    @returns {dict} 崩溃数据
+    """
+    return _parse_crash_file(crash_path, os.stat(crash_path).st_mtime_ns)
+
+
+def _load_crash_summary(crash_path):
+    """
+    读取崩溃描述，优先使用崩溃时写入的摘要文件，没有摘要时回退到解析完整JSON
+    
+    @param {str} crash_path - 崩溃记录文件路径
+    @returns {str} 崩溃描述
+    """
+    summary_path = crash_path[:-len('.json')] + '.summary'
+    try:
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return _load_crash_data(crash_path).get('crash_info', '')
+
+
+def get_crash_dir(group_name):
+    """
+    获取指定组的崩溃记录目录
     
     @param {str} group_name - 监控组名称
+    @returns {str} 崩溃记录目录路径
+    """
+    return os.path.join(project_root, 'logs', group_name, 'crashes')
+
+
+def format_crash_list(group_name, crash_dir=None):
     """
-    crash_dir = os.path.join(project_root, 'logs', group_name, 'crashes')
+    生成指定组的崩溃记录列表文本
     
-    if not os.path.exists(crash_dir):
-        print(f"未找到{group_name}的崩溃记录目录")
-        return
+    @param {str} group_name - 监控组名称
+    @param {str} crash_dir - 崩溃记录目录，不提供则根据组名计算
+    @returns {str} 格式化的崩溃记录列表
+    """
+    if crash_dir is None:
+        crash_dir = get_crash_dir(group_name)
     
-    crash_files = [f for f in os.listdir(crash_dir) if f.endswith('.json')]
+    crash_files = _load_sorted_crashes(crash_dir)
+    if crash_files is None:
+        return f"未找到{group_name}的崩溃记录目录"
     
     if not crash_files:
-        print(f"未找到{group_name}的崩溃记录")
-        return
-    
-    # 按时间排序
-    crash_files.sort(reverse=True)
+        return f"未找到{group_name}的崩溃记录"
     
-    print(f"\n{'='*60}")
-    print(f"{group_name} 崩溃记录列表 (共 {len(crash_files)} 条)")
-    print(f"{'='*60}")
-    print(f"{'序号':<6}{'时间':<20}{'崩溃类型':<15}{'描述':<40}")
-    print(f"{'-'*60}")
+    lines = [
+        f"\n{'='*60}",
+        f"{group_name} 崩溃记录列表 (共 {len(crash_files)} 条)",
+        f"{'='*60}",
+        f"{'序号':<6}{'时间':<20}{'崩溃类型':<15}{'描述':<40}",
+        f"{'-'*60}",
+    ]
     
     for i, crash_file in enumerate(crash_files[:20]):  # 只显示最近20条
         try:
             # 从文件名解析基本信息
-            parts = crash_file.replace('.json', '').split('_')
-            date_str = parts[1]
-            time_str = parts[2]
-            crash_type = '_'.join(parts[3:])
+            match = _CRASH_NAME_RE.match(crash_file)
+            if not match:
+                raise ValueError("文件名格式不正确")
+            date_str, time_str, crash_type = match.groups()
             
             # 格式化日期时间
             datetime_str = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]} {time_str[:2]}:{time_str[2:4]}:{time_str[4:]}"
             
             # 尝试读取文件获取更多信息
             crash_path = os.path.join(crash_dir, crash_file)
-            with open(crash_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                crash_info = data.get('crash_info', '')
-                # 截断描述
-                if len(crash_info) > 37:
-                    crash_info = crash_info[:37] + '...'
-                
-                print(f"{i+1:<6}{datetime_str:<20}{crash_type:<15}{crash_info:<40}")
+            crash_info = _load_crash_summary(crash_path)
+            # 截断描述
+            if len(crash_info) > 37:
+                crash_info = crash_info[:37] + '...'
+            
+            lines.append(f"{i+1:<6}{datetime_str:<20}{crash_type:<15}{crash_info:<40}")
         except Exception as e:
-            print(f"{i+1:<6}{crash_file:<60} (解析错误: {str(e)})")
+            lines.append(f"{i+1:<6}{crash_file:<60} (解析错误: {str(e)})")
+    
+    lines.append(f"{'='*60}")
+    lines.append(f"使用 'python bin/crash_report.py {group_name} 序号' 查看详细信息\n")
     
-    print(f"{'='*60}")
-    print(f"使用 'python bin/crash_report.py {group_name} 序号' 查看详细信息\n")
+    return "\n".join(lines)
 
 
-def show_crash_details(group_name, crash_index):
+def list_crashes(group_name, crash_dir=None):
+    """
+    列出指定组的所有崩溃记录
+    
+    @param {str} group_name - 监控组名称
+    @param {str} crash_dir - 崩溃记录目录，不提供则根据组名计算
+    """
+    print(format_crash_list(group_name, crash_dir))
+
+
+def list_crashes_parallel(crash_dirs):
+    """
+    并行读取多个组的崩溃记录，并按组的原始顺序输出
+    
+    @param {list} crash_dirs - (组名称, 崩溃记录目录) 列表
+    """
+    groups = [group for group, _ in crash_dirs]
+    dirs = [crash_dir for _, crash_dir in crash_dirs]
+    
+    # 读取崩溃文件以IO为主，各组之间互不依赖，可重叠等待时间
+    with ThreadPoolExecutor(max_workers=len(crash_dirs)) as executor:
+        for report in executor.map(format_crash_list, groups, dirs):
+            print(report)
+
+
+def show_crash_details(group_name, crash_index, crash_dir=None):
     """
     显示指定崩溃记录的详细信息
     
     @param {str} group_name - 监控组名称
     @param {int} crash_index - 崩溃记录索引
+    @param {str} crash_dir - 崩溃记录目录，不提供则根据组名计算
     """
-    crash_dir = os.path.join(project_root, 'logs', group_name, 'crashes')
+    if crash_dir is None:
+        crash_dir = get_crash_dir(group_name)
     
-    if not os.path.exists(crash_dir):
+    crash_files = _load_sorted_crashes(crash_dir)
+    if crash_files is None:
         print(f"未找到{group_name}的崩溃记录目录")
         return
     
-    crash_files = [f for f in os.listdir(crash_dir) if f.endswith('.json')]
-    
     if not crash_files:
         print(f"未找到{group_name}的崩溃记录")
         return
     
-    # 按时间排序
-    crash_files.sort(reverse=True)
-    
     if crash_index < 1 or crash_index > len(crash_files):
         print(f"无效的崩溃记录索引: {crash_index}，有效范围: 1-{len(crash_files)}")
         return
@@ -125,8 +223,7 @@ def show_crash_details(group_name, crash_index):
     crash_path = os.path.join(crash_dir, crash_file)
     
     try:
-        with open(crash_path, 'r', encoding='utf-8') as f:
-            crash_data = json.load(f)
+        crash_data = _load_crash_data(crash_path)
         
         # 格式化崩溃报告
         report = format_crash_report(crash_data)
@@ -135,28 +232,70 @@ def show_crash_details(group_name, crash_index):
         print(f"读取崩溃记录失败: {str(e)}")
 
 
+class CrashRecord:
+    """
+    崩溃记录类，从崩溃数据中一次性提取格式化报告所需的字段
+    """
+    __slots__ = ('crash_type', 'crash_info', 'timestamp', 'platform', 'python_version',
+                 'pid', 'process_name', 'working_directory', 'memory_usage', 'cpu_usage',
+                 'additional_info')
+    
+    def __init__(self, crash_type='未知', crash_info='未知', timestamp=None, platform='未知',
+                 python_version='未知', pid='未知', process_name='未知', working_directory='未知',
+                 memory_usage=None, cpu_usage=None, additional_info=None):
+        self.crash_type = crash_type
+        self.crash_info = crash_info
+        self.timestamp = timestamp
+        self.platform = platform
+        self.python_version = python_version
+        self.pid = pid
+        self.process_name = process_name
+        self.working_directory = working_directory
+        self.memory_usage = memory_usage or {}
+        self.cpu_usage = cpu_usage or {}
+        self.additional_info = additional_info or {}
+    
+    @classmethod
+    def from_dict(cls, data):
+        """从崩溃数据字典创建实例"""
+        system_info = data.get('system_info', {})
+        return cls(
+            crash_type=data.get('crash_type', '未知'),
+            crash_info=data.get('crash_info', '未知'),
+            timestamp=system_info.get('timestamp'),
+            platform=system_info.get('platform', '未知'),
+            python_version=system_info.get('python_version', '未知'),
+            pid=system_info.get('pid', '未知'),
+            process_name=system_info.get('process_name', '未知'),
+            working_directory=system_info.get('working_directory', '未知'),
+            memory_usage=system_info.get('memory_usage', {}),
+            cpu_usage=system_info.get('cpu_usage', {}),
+            additional_info=data.get('additional_info', {})
+        )
+
+
 def format_crash_report(crash_data):
     """
     格式化崩溃报告为可读字符串
     
-    @param {dict} crash_data - 崩溃数据
+    @param {CrashRecord|dict} crash_data - 崩溃记录或崩溃数据字典
     @returns {str} 格式化的崩溃报告
     """
-    report = []
+    record = crash_data if isinstance(crash_data, CrashRecord) else CrashRecord.from_dict(crash_data)
     
-    report.append("="*80)
-    report.append(" "*30 + "崩溃报告详情")
-    report.append("="*80)
-    report.append("")
-    
-    # 基本崩溃信息
-    report.append("--- 基本信息 ---")
-    report.append(f"崩溃类型: {crash_data.get('crash_type', '未知')}")
-    report.append(f"崩溃信息: {crash_data.get('crash_info', '未知')}")
+    # 标题、基本崩溃信息一次性构建
+    report = [
+        _REPORT_RULE,
+        _REPORT_TITLE,
+        _REPORT_RULE,
+        "",
+        "--- 基本信息 ---",
+        f"崩溃类型: {record.crash_type}",
+        f"崩溃信息: {record.crash_info}",
+    ]
     
     # 时间戳
-    system_info = crash_data.get('system_info', {})
-    timestamp = system_info.get('timestamp')
+    timestamp = record.timestamp
     if timestamp:
         try:
             dt = datetime.fromisoformat(timestamp)
@@ -164,62 +303,97 @@ def format_crash_report(crash_data):
         except:
             report.append(f"崩溃时间: {timestamp}")
     
-    report.append("")
-    
     # 系统信息
-    report.append("--- 系统信息 ---")
-    report.append(f"平台: {system_info.get('platform', '未知')}")
-    report.append(f"Python版本: {system_info.get('python_version', '未知')}")
-    report.append(f"进程ID: {system_info.get('pid', '未知')}")
-    report.append(f"进程名称: {system_info.get('process_name', '未知')}")
-    report.append(f"工作目录: {system_info.get('working_directory', '未知')}")
-    report.append("")
+    report += [
+        "",
+        "--- 系统信息 ---",
+        f"平台: {record.platform}",
+        f"Python版本: {record.python_version}",
+        f"进程ID: {record.pid}",
+        f"进程名称: {record.process_name}",
+        f"工作目录: {record.working_directory}",
+        "",
+    ]
     
     # 资源使用情况
-    memory_usage = system_info.get('memory_usage', {})
+    memory_usage = record.memory_usage
     if memory_usage and isinstance(memory_usage, dict):
         report.append("--- 内存使用情况 ---")
         readable = memory_usage.get('readable', {})
         if readable:
-            report.append(f"物理内存: {readable.get('rss', '未知')}")
-            report.append(f"虚拟内存: {readable.get('vms', '未知')}")
-        
-        report.append(f"内存使用率: {memory_usage.get('percent', '未知')}%")
-        report.append("")
+            report += [
+                f"物理内存: {readable.get('rss', '未知')}",
+                f"虚拟内存: {readable.get('vms', '未知')}",
+            ]
+        report += [f"内存使用率: {memory_usage.get('percent', '未知')}%", ""]
     
-    cpu_usage = system_info.get('cpu_usage', {})
+    cpu_usage = record.cpu_usage
     if cpu_usage and isinstance(cpu_usage, dict):
-        report.append("--- CPU使用情况 ---")
-        report.append(f"CPU使用率: {cpu_usage.get('percent', '未知')}%")
-        report.append(f"线程数: {cpu_usage.get('threads', '未知')}")
-        report.append(f"用户态CPU时间: {cpu_usage.get('user_time', '未知')}s")
-        report.append(f"系统态CPU时间: {cpu_usage.get('system_time', '未知')}s")
-        report.append("")
+        report += [
+            "--- CPU使用情况 ---",
+            f"CPU使用率: {cpu_usage.get('percent', '未知')}%",
+            f"线程数: {cpu_usage.get('threads', '未知')}",
+            f"用户态CPU时间: {cpu_usage.get('user_time', '未知')}s",
+            f"系统态CPU时间: {cpu_usage.get('system_time', '未知')}s",
+            "",
+        ]
     
     # 异常详情
-    additional_info = crash_data.get('additional_info', {})
+    additional_info = record.additional_info
     if additional_info:
         if 'exception_type' in additional_info:
-            report.append("--- 异常详情 ---")
-            report.append(f"异常类型: {additional_info.get('exception_type', '未知')}")
-            report.append("")
+            report += [
+                "--- 异常详情 ---",
+                f"异常类型: {additional_info.get('exception_type', '未知')}",
+                "",
+            ]
         
         # 堆栈跟踪
         if 'traceback' in additional_info or 'stack_trace' in additional_info:
-            report.append("--- 堆栈跟踪 ---")
             traceback_str = additional_info.get('traceback') or additional_info.get('stack_trace') or '无堆栈信息'
-            report.append(traceback_str)
-            report.append("")
+            report += ["--- 堆栈跟踪 ---", traceback_str, ""]
     
     return "\n".join(report)
 
 
+def _import_crash_handler():
+    """
+    导入crash_handler模块，仅在需要时调用；导入失败时输出诊断信息并退出
+    
+    @returns {module} crash_handler模块
+    """
+    try:
+        from waf_monitor import crash_handler
+        return crash_handler
+    except ImportError:
+        # 处理crash_handler模块不存在的情况
+        print("错误: 无法导入crash_handler模块。")
+        # 检查模块文件是否存在
+        crash_handler_path = os.path.join(project_root, 'waf_monitor', 'crash_handler.py')
+        if not os.path.exists(crash_handler_path):
+            print(f"模块文件不存在: {crash_handler_path}")
+            print("请确保waf_monitor目录下存在crash_handler.py文件")
+        else:
+            print(f"模块文件存在但无法导入，可能存在语法错误或依赖问题: {crash_handler_path}")
+            print("尝试手动导入模块以查看具体错误...")
+            try:
+                # 尝试获取更具体的导入错误
+                import waf_monitor
+                print(f"已成功导入waf_monitor包，但无法导入crash_handler模块")
+                print(f"可用模块: {dir(waf_monitor)}")
+            except Exception as import_err:
+                print(f"导入waf_monitor包失败: {import_err}")
+        sys.exit(1)
+
+
 def show_last_crash(group_name):
     """
     显示最近一次崩溃信息
     
     @param {str} group_name - 监控组名称
     """
+    # 只有查看最近一次崩溃时才需要crash_handler，延迟导入以加快其他查询的启动
+    crash_handler = _import_crash_handler()
     report = crash_handler.format_last_crash_report(group_name)
     print(report)
 
@@ -241,16 +415,26 @@ def main():
     else:
         groups = [args.group]
     
-    for group in groups:
-        # 显示最近一次崩溃
-        if args.last:
+    # 最近一次崩溃由crash_handler根据活动记录查找，不需要崩溃目录
+    if args.last:
+        for group in groups:
             show_last_crash(group)
-        # 显示指定索引的崩溃详情
-        elif args.index is not None:
-            show_crash_details(group, args.index)
-        # 列出所有崩溃记录
-        else:
-            list_crashes(group)
+        return
+    
+    # 每个组的崩溃目录只计算一次
+    crash_dirs = [(group, get_crash_dir(group)) for group in groups]
+    
+    # 显示指定索引的崩溃详情
+    if args.index is not None:
+        for group, crash_dir in crash_dirs:
+            show_crash_details(group, args.index, crash_dir)
+    # 列出多个组的崩溃记录时并行读取
+    elif len(crash_dirs) > 1:
+        list_crashes_parallel(crash_dirs)
+    # 列出所有崩溃记录
+    else:
+        for group, crash_dir in crash_dirs:
+            list_crashes(group, crash_dir)
 
 
 if __name__ == "__main__":
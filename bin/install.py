@@ -17,6 +17,26 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
 sys.path.insert(0, project_root)
 
+# 运行环境信息在进程生命周期内不变，只获取一次
+SYSTEM_NAME = platform.system()
+PYTHON_EXECUTABLE = sys.executable
+
+# 系统包安装成功后仍需通过pip补充安装的额外包
+MINIMAL_PACKAGES = ("setproctitle>=1.2.0", "jsonschema>=3.2.0")
+
+# 非交互环境（如CI或重定向到文件）下不输出安装过程，减少进度条渲染和终端IO
+QUIET = not sys.stdout.isatty()
+
+
+def run_command(cmd):
+    """
+    执行安装命令，非交互环境下丢弃标准输出
+    
+    @param {list} cmd - 命令行参数列表
+    @raises {subprocess.CalledProcessError} 命令返回非零退出码时抛出
+    """
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL if QUIET else None)
+
 
 def is_root():
     """
@@ -83,13 +103,13 @@ def install_build_tools():
     try:
         if system_type == 'rhel':
             print("检测到RHEL/CentOS系统，安装gcc和python3-devel...")
-            subprocess.check_call(['yum', 'install', '-y', 'gcc', 'python3-devel'])
+            run_command(['yum', 'install', '-y', 'gcc', 'python3-devel'])
             print("编译工具安装成功")
             return True
         elif system_type == 'debian':
             print("检测到Debian/Ubuntu系统，安装gcc和python3-dev...")
-            subprocess.check_call(['apt-get', 'update'])
-            subprocess.check_call(['apt-get', 'install', '-y', 'gcc', 'python3-dev'])
+            run_command(['apt-get', 'update'])
+            run_command(['apt-get', 'install', '-y', 'gcc', 'python3-dev'])
             print("编译工具安装成功")
             return True
         else:
@@ -118,14 +138,14 @@ def install_system_packages():
         if system_type == 'rhel':
             print("检测到RHEL/CentOS系统")
             # 安装EPEL仓库
-            subprocess.check_call(['yum', 'install', '-y', 'epel-release'])
+            run_command(['yum', 'install', '-y', 'epel-release'])
             # 安装系统依赖
-            subprocess.check_call(['yum', 'install', '-y', 'python3-psutil', 'python3-requests', 'python3-setuptools', 'python3-pip', 'python3-yaml', 'python3-dateutil'])
+            run_command(['yum', 'install', '-y', 'python3-psutil', 'python3-requests', 'python3-setuptools', 'python3-pip', 'python3-yaml', 'python3-dateutil'])
             return True
         elif system_type == 'debian':
             print("检测到Debian/Ubuntu系统")
-            subprocess.check_call(['apt-get', 'update'])
-            subprocess.check_call(['apt-get', 'install', '-y', 'python3-psutil', 'python3-requests', 'python3-setuptools', 'python3-pip', 'python3-yaml', 'python3-dateutil'])
+            run_command(['apt-get', 'update'])
+            run_command(['apt-get', 'install', '-y', 'python3-psutil', 'python3-requests', 'python3-setuptools', 'python3-pip', 'python3-yaml', 'python3-dateutil'])
             return True
         else:
             print("无法确定系统类型，无法使用系统包管理器")
@@ -135,25 +155,42 @@ def install_system_packages():
         return False
 
 
-def install_pip_package(package_name, mirror_url=None):
+def pip_install_command(*args, mirror_url=None):
     """
-    使用pip安装单个包
+    组装pip安装命令
     
-    @param {str} package_name - 包名称
+    @param {str} args - 传给pip install的参数
     @param {str} mirror_url - 镜像源URL
-    @returns {bool} 安装是否成功
+    @returns {list} 完整的命令行参数列表
     """
-    print(f"正在安装 {package_name}...")
-    cmd = [sys.executable, "-m", "pip", "install", package_name]
+    # 跳过pip自身的版本检查，省去一次网络请求
+    cmd = [PYTHON_EXECUTABLE, "-m", "pip", "install", "--disable-pip-version-check"]
+    if QUIET:
+        cmd.append("--quiet")
+    cmd.extend(args)
     
     if mirror_url:
         cmd.extend(["-i", mirror_url])
     
+    return cmd
+
+
+def install_pip_packages(package_names, mirror_url=None):
+    """
+    使用pip一次性安装多个包，只启动一次pip并统一解析依赖
+    
+    @param {list} package_names - 包名称列表
+    @param {str} mirror_url - 镜像源URL
+    @returns {bool} 安装是否成功
+    """
+    packages_str = ' '.join(package_names)
+    print(f"正在安装 {packages_str}...")
+    
     try:
-        subprocess.check_call(cmd)
+        run_command(pip_install_command(*package_names, mirror_url=mirror_url))
         return True
     except subprocess.CalledProcessError as e:
-        print(f"安装 {package_name} 失败: {str(e)}")
+        print(f"安装 {packages_str} 失败: {str(e)}")
         return False
 
 
@@ -178,11 +215,7 @@ def install_requirements(use_mirror=True):
         print(f"使用镜像源: {mirror_url}")
     
     try:
-        cmd = [sys.executable, "-m", "pip", "install", "-r", requirements_file]
-        if mirror_url:
-            cmd.extend(["-i", mirror_url])
-        
-        subprocess.check_call(cmd)
+        run_command(pip_install_command("-r", requirements_file, mirror_url=mirror_url))
         return True
     except subprocess.CalledProcessError as e:
         print(f"使用pip安装依赖失败: {str(e)}")
@@ -198,39 +231,9 @@ def install_minimal_requirements(use_mirror=True):
     """
     print("安装最小化依赖...")
     
-    # 创建临时的最小化requirements文件
-    temp_requirements = os.path.join(project_root, 'requirements_minimal.txt')
-    
-    try:
-        with open(temp_requirements, 'w') as f:
-            f.write("""
-# 可能需要的额外包
-setproctitle>=1.2.0
-jsonschema>=3.2.0
-            """)
-        
-        # 使用镜像源安装
-        mirror_url = "https://pypi.tuna.tsinghua.edu.cn/simple" if use_mirror else None
-        cmd = [sys.executable, "-m", "pip", "install", "-r", temp_requirements, "--skip-installed"]
-        if mirror_url:
-            cmd.extend(["-i", mirror_url])
-        
-        subprocess.check_call(cmd)
-        
-        # 清理临时文件
-        if os.path.exists(temp_requirements):
-            os.remove(temp_requirements)
-        
-        return True
-    except Exception as e:
-        print(f"安装最小化依赖失败: {str(e)}")
-        # 清理临时文件
-        if os.path.exists(temp_requirements):
-            try:
-                os.remove(temp_requirements)
-            except:
-                pass
-        return False
+    # 使用镜像源安装
+    mirror_url = "https://pypi.tuna.tsinghua.edu.cn/simple" if use_mirror else None
+    return install_pip_packages(MINIMAL_PACKAGES, mirror_url)
 
 
 def create_requirements():
@@ -300,9 +303,12 @@ def setup_directories():
     
     try:
         for directory in required_dirs:
-            if not os.path.exists(directory):
+            # 直接创建目录，已存在时跳过，避免先exists再makedirs的两次系统调用
+            try:
                 os.makedirs(directory)
-                print(f"已创建目录: {directory}")
+            except FileExistsError:
+                continue
+            print(f"已创建目录: {directory}")
         return True
     except Exception as e:
         print(f"创建目录结构失败: {str(e)}")
@@ -315,29 +321,26 @@ def set_script_permissions():
     
     @returns {bool} 设置是否成功
     """
-    if platform.system() == 'Windows':
+    if SYSTEM_NAME == 'Windows':
         print("在Windows系统上跳过设置可执行权限")
         return True
     
-    script_files = [
-        os.path.join(script_dir, 'monitor_group1.py'),
-        os.path.join(script_dir, 'monitor_group2.py'),
-        os.path.join(script_dir, 'monitor_group3.py'),
-        os.path.join(script_dir, 'monitor_group4.py'),
-        os.path.join(script_dir, 'monitor_group5.py'),
-        os.path.join(script_dir, 'monitor_group6.py'),
-        os.path.join(script_dir, 'start_all.py'),
-        os.path.join(script_dir, 'stop_all.py'),
-        os.path.join(script_dir, 'status.py'),
-        os.path.join(script_dir, 'watchdog.py'),
-        os.path.join(script_dir, 'install.py')
-    ]
+    script_names = frozenset({
+        'monitor_group.py',
+        'start_all.py',
+        'stop_all.py',
+        'status.py',
+        'watchdog.py',
+        'install.py'
+    })
     
     try:
-        for script in script_files:
-            if os.path.exists(script):
-                os.chmod(script, 0o755)  # 设置可执行权限
-                print(f"已设置可执行权限: {script}")
+        # 一次扫描脚本目录，只处理存在的脚本文件
+        with os.scandir(script_dir) as entries:
+            for entry in entries:
+                if entry.name in script_names and entry.is_file():
+                    os.chmod(entry.path, 0o755)  # 设置可执行权限
+                    print(f"已设置可执行权限: {entry.path}")
         return True
     except Exception as e:
         print(f"设置脚本权限失败: {str(e)}")
@@ -420,9 +423,9 @@ def main():
     print(f"安装完成！用时 {duration:.2f} 秒")
     
     print("\n可以通过以下命令启动系统:")
-    print(f"  {sys.executable} {os.path.join(script_dir, 'start_all.py')}")
+    print(f"  {PYTHON_EXECUTABLE} {os.path.join(script_dir, 'start_all.py')}")
     print("\n或者启动单个监控组:")
-    print(f"  {sys.executable} {os.path.join(script_dir, 'monitor_group1.py')}")
+    print(f"  {PYTHON_EXECUTABLE} {os.path.join(script_dir, 'monitor_group.py')} --group group1")
     print("=" * 60)
     
     return 0
@@ -8,6 +8,7 @@ WAF监控 - 日志文件迁移工具
 
 import os
 import sys
+import errno
 import shutil
 import logging
 
@@ -20,6 +21,46 @@ sys.path.insert(0, project_root)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("migrate_logs")
 
+
+def _build_log_migrations():
+    """
+    预先计算所有需要迁移的日志文件路径
+    
+    @returns {tuple} (文件名, 源路径, 目标路径, 目标目录, 备份路径) 元组
+    """
+    logs_dir = os.path.join(project_root, 'logs')
+    
+    # 需要迁移的文件映射 (文件名, 目标子目录, 目标文件名)
+    file_mappings = (
+        ('group1_startup.log', 'group1', 'startup.log'),
+        ('group2_startup.log', 'group2', 'startup.log'),
+        ('group3_startup.log', 'group3', 'startup.log'),
+        ('group4_startup.log', 'group4', 'startup.log'),
+        ('group5_startup.log', 'group5', 'startup.log'),
+        ('group6_startup.log', 'group6', 'startup.log'),
+        ('watchdog_startup.log', 'watchdog', 'startup.log'),
+        ('daemon.log', 'daemon', 'daemon.log'),
+        ('daemon_error.log', 'daemon', 'daemon_error.log'),
+        ('startup.log', 'daemon', 'startup.log'),
+    )
+    
+    migrations = []
+    for filename, subdir, target_name in file_mappings:
+        target_dir = os.path.join(logs_dir, subdir)
+        target_path = os.path.join(target_dir, target_name)
+        migrations.append((
+            filename,
+            os.path.join(logs_dir, filename),
+            target_path,
+            target_dir,
+            f"{target_path}.bak",
+        ))
+    return tuple(migrations)
+
+
+# 迁移路径只依赖项目根目录，模块加载时计算一次
+LOG_MIGRATIONS = _build_log_migrations()
+
 def ensure_directories():
     """
     确保所有必要的目录存在
@@ -36,9 +77,27 @@ def ensure_directories():
     ]
     
     for directory in required_dirs:
-        if not os.path.exists(directory):
-            logger.info(f"创建目录: {directory}")
-            os.makedirs(directory, exist_ok=True)
+        try:
+            os.makedirs(directory)
+        except FileExistsError:
+            continue
+        logger.info(f"创建目录: {directory}")
+
+def _move_file(source_path, target_path):
+    """
+    移动文件，同一文件系统内直接重命名，跨文件系统时回退为复制后删除
+    
+    @param {str} source_path - 源文件路径
+    @param {str} target_path - 目标文件路径
+    """
+    try:
+        # 同一文件系统内只修改目录项，不需要复制文件内容
+        os.replace(source_path, target_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.copy2(source_path, target_path)
+        os.remove(source_path)
 
 def migrate_logs():
     """
@@ -46,44 +105,30 @@ def migrate_logs():
     """
     logs_dir = os.path.join(project_root, 'logs')
     
-    # 需要迁移的文件映射 {文件名: 目标目录}
-    file_mappings = {
-        'group1_startup.log': os.path.join(logs_dir, 'group1', 'startup.log'),
-        'group2_startup.log': os.path.join(logs_dir, 'group2', 'startup.log'),
-        'group3_startup.log': os.path.join(logs_dir, 'group3', 'startup.log'),
-        'group4_startup.log': os.path.join(logs_dir, 'group4', 'startup.log'),
-        'group5_startup.log': os.path.join(logs_dir, 'group5', 'startup.log'),
-        'group6_startup.log': os.path.join(logs_dir, 'group6', 'startup.log'),
-        'watchdog_startup.log': os.path.join(logs_dir, 'watchdog', 'startup.log'),
-        'daemon.log': os.path.join(logs_dir, 'daemon', 'daemon.log'),
-        'daemon_error.log': os.path.join(logs_dir, 'daemon', 'daemon_error.log'),
-        'startup.log': os.path.join(logs_dir, 'daemon', 'startup.log'),
-    }
-    
     migrated_count = 0
     
+    # 一次扫描日志目录，收集实际存在的待迁移文件
+    try:
+        with os.scandir(logs_dir) as entries:
+            existing_files = {entry.name for entry in entries if entry.is_file()}
+    except FileNotFoundError:
+        return migrated_count
+    
     # 迁移文件
-    for filename, target_path in file_mappings.items():
-        source_path = os.path.join(logs_dir, filename)
-        target_dir = os.path.dirname(target_path)
-        
-        if os.path.exists(source_path):
+    for filename, source_path, target_path, target_dir, backup_path in LOG_MIGRATIONS:
+        if filename in existing_files:
             # 确保目标目录存在
             os.makedirs(target_dir, exist_ok=True)
             
             # 如果目标文件已存在，备份它
             if os.path.exists(target_path):
-                backup_path = f"{target_path}.bak"
                 logger.info(f"备份现有文件到: {backup_path}")
-                shutil.copy2(target_path, backup_path)
+                _move_file(target_path, backup_path)
             
             # 移动文件
             logger.info(f"移动 {filename} 到 {target_path}")
             try:
-                # 复制文件内容
-                shutil.copy2(source_path, target_path)
-                # 删除源文件
-                os.remove(source_path)
+                _move_file(source_path, target_path)
                 migrated_count += 1
             except Exception as e:
                 logger.error(f"移动文件 {filename} 时出错: {str(e)}")
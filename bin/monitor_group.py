@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WAF监控 - 监控组脚本
+
+用法: python bin/monitor_group.py --group group1
+"""
+
+import os
+import sys
+import time
+import atexit
+import logging
+import signal
+import select
+import argparse
+
+# 添加项目根目录到Python路径
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+try:
+    import setproctitle
+except ImportError:
+    setproctitle = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from waf_monitor import monitor
+from waf_monitor import crash_handler
+
+# 数据目录
+DATA_DIR = os.path.join(project_root, 'data')
+
+# 启动过程日志，输出到标准输出(由start_all重定向到startup.log)
+log = logging.getLogger('monitor_group')
+log.setLevel(logging.INFO)
+log.propagate = False
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+log.addHandler(_log_handler)
+
+# 主循环检查间隔(秒)
+CHECK_INTERVAL = 10
+
+# 监控线程在RESTART_THRESHOLD秒内最多重启MAX_RESTARTS次，重启前的退避时间不超过MAX_BACKOFF秒
+MAX_RESTARTS = 10
+RESTART_THRESHOLD = 300
+MAX_BACKOFF = 60
+
+# 自管道：信号处理函数和监控线程退出时只向写端写入一个字节，主循环在读端上等待
+_wakeup_r, _wakeup_w = os.pipe()
+os.set_blocking(_wakeup_w, False)
+
+# 唤醒原因：收到退出信号 / 监控线程已退出
+_WAKE_STOP = b's'
+_WAKE_DIED = b'd'
+
+# 是否已收到退出信号
+_stop_requested = False
+
+
+def _wake_main_loop(reason):
+    """
+    唤醒主循环，只执行一次 write() 系统调用
+    
+    @param {bytes} reason - 唤醒原因
+    """
+    try:
+        os.write(_wakeup_w, reason)
+    except BlockingIOError:
+        # 管道已满，说明主循环已有未处理的唤醒
+        pass
+
+
+def signal_handler(sig, frame):
+    """
+    信号处理函数，只写入自管道，清理工作交由主线程完成
+    """
+    _wake_main_loop(_WAKE_STOP)
+
+
+def wait_for_stop(timeout):
+    """
+    在自管道上等待，直到收到退出信号、监控线程退出或超时
+    
+    @param {float} timeout - 最长等待时间(秒)
+    @returns {bool} 是否收到退出信号
+    """
+    global _stop_requested
+    if not _stop_requested:
+        ready, _, _ = select.select([_wakeup_r], [], [], timeout)
+        if ready and _WAKE_STOP in os.read(_wakeup_r, 64):
+            _stop_requested = True
+    return _stop_requested
+
+
+def acquire_pid_file(pid_file):
+    """
+    打开并锁定PID文件，写入当前进程ID
+    
+    文件描述符在进程存活期间保持打开，进程以任何方式退出(包括SIGKILL)时内核都会自动释放锁
+    
+    @param {str} pid_file - PID文件路径
+    @returns {tuple} (文件描述符, None)；已有其他实例持有锁时返回 (None, 其PID)
+    """
+    fd = os.open(pid_file, os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            old_pid = os.read(fd, 32).decode('ascii', 'replace').strip() or '未知'
+            os.close(fd)
+            return None, old_pid
+    
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode('ascii'))
+    return fd, None
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="WAF监控 - 监控组脚本")
+    parser.add_argument('--group', required=True, help='监控组名称，如group1')
+    args = parser.parse_args()
+    group_name = args.group
+    
+    # 设置进程名称
+    if setproctitle:
+        setproctitle.setproctitle(f"waf-monitor-{group_name}")
+    
+    current_pid = os.getpid()
+    pid_file = os.path.join(DATA_DIR, f"{group_name}.pid")
+    
+    # 打开并锁定PID文件，一次完成单实例检查和PID写入
+    os.makedirs(DATA_DIR, exist_ok=True)
+    pid_fd, old_pid = acquire_pid_file(pid_file)
+    if pid_fd is None:
+        log.warning(f"另一个 {group_name} 监控进程正在运行 (PID: {old_pid})，当前进程将退出")
+        return 1
+    log.info(f"已创建PID文件，PID: {current_pid}")
+    
+    def remove_pid_file():
+        # fork出的子进程不应删除父进程的PID文件
+        if os.getpid() != current_pid:
+            return
+        try:
+            os.unlink(pid_file)
+            log.info(f"已清理PID文件: {pid_file}")
+        except FileNotFoundError:
+            pass
+    
+    # 注册进程退出钩子，确保在任何情况下都能清理PID文件
+    atexit.register(remove_pid_file)
+    
+    # 初始化崩溃处理系统(同时接管sys.excepthook)
+    try:
+        crash_logger = crash_handler.initialize(group_name)['crash_logger']
+    except Exception:
+        log.exception("初始化崩溃处理系统失败，使用备用日志系统")
+        crash_logger = log
+    crash_logger.info(f"{group_name} 监控启动，PID: {current_pid}")
+    
+    # 检查上次崩溃
+    last_crash = crash_handler.check_last_crash(group_name)
+    if last_crash:
+        crash_logger.warning(
+            f"检测到上次程序异常退出: 类型={last_crash.get('crash_type', '未知')}, "
+            f"时间={last_crash.get('timestamp', '未知时间')}, "
+            f"原因={last_crash.get('crash_info', '未知原因')}; "
+            f"使用命令查看详细信息: python bin/crash_report.py {group_name} --last"
+        )
+    
+    # 注册信号处理
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    
+    # 特殊处理SIGPIPE信号，忽略并继续运行
+    try:
+        signal.signal(signal.SIGPIPE, signal.SIG_IGN)
+    except (AttributeError, ValueError) as e:
+        crash_logger.warning(f"无法注册SIGPIPE处理器: {str(e)}")
+    
+    url_monitor = None
+    try:
+        # 创建并启动监控器
+        url_monitor = monitor.create_monitor(group_name)
+        url_monitor.died_callback = lambda: _wake_main_loop(_WAKE_DIED)
+        url_monitor.start()
+        
+        # 保持主进程运行
+        log.info(f"{group_name} 监控已启动，进程ID: {current_pid}, 按Ctrl+C退出...")
+        restart_count = 0
+        last_restart_time = 0
+        
+        while True:
+            try:
+                # 检查持有的PID文件是否已被删除(链接数为0)，如果是则重新创建
+                if os.fstat(pid_fd).st_nlink == 0:
+                    crash_logger.warning(f"PID文件已被删除，正在重新创建...")
+                    new_fd, other_pid = acquire_pid_file(pid_file)
+                    if new_fd is None:
+                        crash_logger.warning(f"新的PID文件已被其他进程锁定 (PID: {other_pid})")
+                    else:
+                        os.close(pid_fd)
+                        pid_fd = new_fd
+                        crash_logger.info(f"已重新创建PID文件，PID: {current_pid}")
+                
+                # 检查监控线程是否还在运行
+                if url_monitor.wait_died(0):
+                    # 计算重启频率
+                    current_time = time.time()
+                    elapsed = current_time - last_restart_time
+                    
+                    if last_restart_time > 0 and elapsed < RESTART_THRESHOLD:
+                        restart_count = min(restart_count + 1, MAX_RESTARTS + 1)
+                        if restart_count > MAX_RESTARTS:
+                            crash_logger.error(f"监控线程在{RESTART_THRESHOLD}秒内重启超过{MAX_RESTARTS}次，退出程序")
+                            return 1
+                        
+                        # 计算退避时间(1, 2, 4 ... 64秒，不超过MAX_BACKOFF)
+                        backoff = min(MAX_BACKOFF, 1 << min(restart_count - 1, 6))
+                        crash_logger.warning(f"监控线程频繁重启，等待{backoff}秒后再次尝试...")
+                        if wait_for_stop(backoff):
+                            break
+                    else:
+                        # 如果距离上次重启时间足够长，重置计数器
+                        if last_restart_time > 0 and elapsed >= RESTART_THRESHOLD:
+                            restart_count = 0
+                    
+                    crash_logger.warning(f"检测到监控线程已退出，正在重新启动...(重启计数:{restart_count})")
+                    # 记录本次重启时间
+                    last_restart_time = current_time
+                    # 重新启动监控线程
+                    url_monitor.start()
+                    crash_logger.info(f"监控线程已重新启动")
+                
+                # 等待下一次检查，收到退出信号或监控线程退出时立即返回
+                if wait_for_stop(CHECK_INTERVAL):
+                    break
+            except Exception as e:
+                crash_logger.error(f"主循环异常: {str(e)}")
+                # 出错时仍然保持循环
+                if wait_for_stop(CHECK_INTERVAL):
+                    break
+        
+        crash_logger.info("收到退出信号，程序正常退出")
+    
+    except KeyboardInterrupt:
+        crash_logger.info("收到键盘中断信号，程序正常退出")
+    
+    except Exception:
+        crash_logger.exception("监控器运行出错")
+        return 1
+    
+    finally:
+        # 确保在所有情况下都停止监控器并清理PID文件
+        if url_monitor is not None:
+            url_monitor.stop()
+            log.info("已停止监控器")
+        remove_pid_file()
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,9 +9,11 @@ import sys
 import subprocess
 import time
 import json
-import psutil
 import argparse
+import logging
+import select
 import signal
+from datetime import datetime
 
 # 添加项目根目录到Python路径
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,6 +22,16 @@ sys.path.insert(0, project_root)
 
 from waf_monitor import utils
 
+# 数据目录、日志目录和watchdog状态文件路径
+DATA_DIR = os.path.join(project_root, 'data')
+LOGS_DIR = os.path.join(project_root, 'logs')
+WATCHDOG_JSON_PATH = os.path.join(DATA_DIR, 'watchdog.json')
+
+# 等待子进程写入PID文件的最长时间，以及轮询的初始间隔和最大间隔(秒)
+STARTUP_TIMEOUT = 10
+STARTUP_POLL_INTERVAL = 0.02
+STARTUP_POLL_MAX_INTERVAL = 0.2
+
 
 def setup_logging(log_file=None):
     """
@@ -27,17 +39,15 @@ def setup_logging(log_file=None):
     
     @param {str} log_file - 日志文件路径
     """
-    import logging
-    
     # 确保日志目录存在
-    logs_dir = os.path.join(project_root, 'logs')
-    os.makedirs(logs_dir, exist_ok=True)
+    logs_dir = LOGS_DIR
+    utils.ensure_dir(logs_dir)
     
     # 如果没有指定日志文件，使用默认路径
     if log_file is None:
         # 创建一个启动脚本专用的目录
         daemon_logs_dir = os.path.join(logs_dir, 'daemon')
-        os.makedirs(daemon_logs_dir, exist_ok=True)
+        utils.ensure_dir(daemon_logs_dir)
         log_file = os.path.join(daemon_logs_dir, 'startup.log')
     
     # 配置根日志记录器
@@ -64,6 +74,33 @@ def setup_logging(log_file=None):
     return logger
 
 
+def open_startup_log(log_file):
+    """
+    以追加方式打开子进程的启动日志，并写入本次启动的分隔行
+    
+    子进程继承文件描述符后直接写入内核，父进程一侧不需要缓冲；
+    追加模式保留历史启动记录，多个写入方也不会互相覆盖
+    
+    @param {str} log_file - 日志文件路径
+    @returns {file} 以二进制追加方式打开的无缓冲文件对象
+    """
+    log_f = open(log_file, 'ab', buffering=0)
+    log_f.write(f"===== {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 启动 =====\n".encode('utf-8'))
+    return log_f
+
+
+def _ignore_sighup():
+    """
+    在子进程exec之前执行，忽略SIGHUP信号，允许在SSH断开后继续运行
+    
+    SIG_IGN的设置在exec后保留，无需再生成包装脚本
+    """
+    try:
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    except (AttributeError, ValueError):
+        pass
+
+
 def daemonize():
     """
     创建守护进程 - 统一模式，适用于所有平台，包括Linux和MacOS
@@ -85,9 +122,8 @@ def daemonize():
     print("创建后台进程...")
     
     # 确保日志目录存在
-    logs_dir = os.path.join(project_root, 'logs')
-    daemon_logs_dir = os.path.join(logs_dir, 'daemon')
-    os.makedirs(daemon_logs_dir, exist_ok=True)
+    daemon_logs_dir = os.path.join(LOGS_DIR, 'daemon')
+    utils.ensure_dir(daemon_logs_dir)
     
     # 准备日志文件
     daemon_log = os.path.join(daemon_logs_dir, 'daemon.log')
@@ -97,15 +133,9 @@ def daemonize():
     args = [sys.executable, os.path.abspath(__file__), '--no-daemon',
             f'--log-file={daemon_log}']
     
-    # 确保data目录存在，用于存储PID文件
-    data_dir = os.path.join(project_root, 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    
-    pid_file = os.path.join(data_dir, 'daemon.pid')
-    
     # 打开日志文件
-    out_log = open(daemon_log, 'w')
-    err_log = open(daemon_err, 'w')
+    out_log = open_startup_log(daemon_log)
+    err_log = open_startup_log(daemon_err)
     
     try:
         # 创建子进程，确保完全脱离终端
@@ -118,18 +148,12 @@ def daemonize():
             start_new_session=True  # 创建新会话，确保进程不受终端影响
         )
         
-        # 等待短暂时间确认进程启动
-        time.sleep(2)
-        
-        if utils.is_process_running(process.pid):
+        # 等待子进程写入daemon.pid确认启动，子进程提前退出时立即返回
+        if wait_for_startup('daemon', process):
             print(f"\033[32m[✓] 守护进程创建成功!\033[0m PID: {process.pid}")
             print(f"\033[32m[✓] 启动日志将记录到: {daemon_log}\033[0m")
             print("\033[32m[✓] 可以使用 'python3 status.py' 查看监控状态\033[0m")
             
-            # 写入PID文件
-            with open(pid_file, 'w') as f:
-                f.write(str(process.pid) + '\n')
-                
             # 父进程退出，允许子进程继续在后台运行
             sys.exit(0)
         else:
@@ -146,26 +170,43 @@ def daemonize():
         err_log.close()
 
 
-def update_watchdog_status(group_name, pid):
+def _load_watchdog():
     """
-    更新监控进程状态
+    读取watchdog状态文件
     
-    @param {str} group_name - 组名称
-    @param {int} pid - 进程ID
+    @returns {dict} 各组的监控状态，文件不存在或读取失败时返回空字典
     """
-    watchdog_json_path = os.path.join(project_root, 'data', 'watchdog.json')
-    watchdog_data = {}
+    try:
+        return utils.load_json(WATCHDOG_JSON_PATH)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"读取watchdog状态文件时出错: {str(e)}")
+        return {}
+
+
+def _save_watchdog(watchdog_data):
+    """
+    保存watchdog状态文件
     
-    # 尝试读取现有状态
-    if os.path.exists(watchdog_json_path):
-        try:
-            with open(watchdog_json_path, 'r', encoding='utf-8') as f:
-                watchdog_data = json.load(f)
-        except Exception as e:
-            print(f"读取watchdog状态文件时出错: {str(e)}")
+    @param {dict} watchdog_data - 各组的监控状态
+    """
+    try:
+        utils.save_json_atomic(WATCHDOG_JSON_PATH, watchdog_data)
+        print("已保存更新后的watchdog状态")
+    except Exception as e:
+        print(f"保存watchdog状态文件时出错: {str(e)}")
+
+
+def update_watchdog_status(group_name, pid, watchdog_data):
+    """
+    更新监控进程状态(仅修改内存中的状态，由调用方统一保存)
     
+    @param {str} group_name - 组名称
+    @param {int} pid - 进程ID
+    @param {dict} watchdog_data - 预先加载的watchdog状态
+    """
     # 更新或创建组的状态
-    from datetime import datetime
     now = datetime.now().isoformat()
     
     if group_name in watchdog_data:
@@ -183,177 +224,154 @@ def update_watchdog_status(group_name, pid):
             'last_check_time': now,
             'last_start_time': now
         }
+    print(f"已更新 {group_name} 的监控状态")
+
+
+def reset_all_restart_counts(watchdog_data):
+    """
+    重置所有组的重启计数(仅修改内存中的状态，由调用方统一保存)
     
-    # 保存更新后的状态
-    try:
-        with open(watchdog_json_path, 'w', encoding='utf-8') as f:
-            json.dump(watchdog_data, f, ensure_ascii=False, indent=2)
-        print(f"已更新 {group_name} 的监控状态")
-    except Exception as e:
-        print(f"保存watchdog状态文件时出错: {str(e)}")
+    @param {dict} watchdog_data - 预先加载的watchdog状态
+    """
+    for group in watchdog_data:
+        old_count = watchdog_data[group].get('restart_count', 0)
+        old_status = watchdog_data[group].get('status', '未知')
+        
+        if old_count > 0 or old_status == "已停止 - 超过最大重启次数":
+            watchdog_data[group]['restart_count'] = 0
+            if old_status == "已停止 - 超过最大重启次数":
+                watchdog_data[group]['status'] = "已停止"
+            print(f"已重置 {group} 状态: 重启计数 {old_count} -> 0")
 
 
-def reset_all_restart_counts():
+def wait_for_startup(name, process, timeout=STARTUP_TIMEOUT):
     """
-    重置所有组的重启计数
+    等待子进程写入自己的PID文件(data/<name>.pid)
+    
+    PID文件内容等于子进程PID即视为启动成功，轮询间隔从STARTUP_POLL_INTERVAL开始按1.5倍递增；
+    支持pidfd_open的系统上在pidfd上等待，子进程提前退出会立即唤醒
+    
+    @param {str} name - PID文件名称，如组名、watchdog或daemon
+    @param {subprocess.Popen} process - 启动的子进程
+    @param {float} timeout - 最长等待时间(秒)
+    @returns {int|None} 启动成功返回进程PID，子进程退出或超时返回None
     """
-    watchdog_json_path = os.path.join(project_root, 'data', 'watchdog.json')
-    if not os.path.exists(watchdog_json_path):
-        return
+    pidfd = None
+    if hasattr(os, 'pidfd_open'):
+        try:
+            pidfd = os.pidfd_open(process.pid)
+        except OSError:
+            pidfd = None
     
     try:
-        # 读取当前状态
-        with open(watchdog_json_path, 'r', encoding='utf-8') as f:
-            watchdog_data = json.load(f)
-        
-        # 修改所有组的重启计数和状态
-        updated = False
-        for group in watchdog_data:
-            old_count = watchdog_data[group].get('restart_count', 0)
-            old_status = watchdog_data[group].get('status', '未知')
+        deadline = time.monotonic() + timeout
+        delay = STARTUP_POLL_INTERVAL
+        while True:
+            if utils.load_pid(name) == process.pid:
+                return process.pid
+            if process.poll() is not None:
+                return None
             
-            if old_count > 0 or old_status == "已停止 - 超过最大重启次数":
-                watchdog_data[group]['restart_count'] = 0
-                if old_status == "已停止 - 超过最大重启次数":
-                    watchdog_data[group]['status'] = "已停止"
-                updated = True
-                print(f"已重置 {group} 状态: 重启计数 {old_count} -> 0")
-        
-        # 保存更新后的状态
-        if updated:
-            with open(watchdog_json_path, 'w', encoding='utf-8') as f:
-                json.dump(watchdog_data, f, ensure_ascii=False, indent=2)
-            print("已保存更新后的watchdog状态")
-    
-    except Exception as e:
-        print(f"重置重启计数时出错: {str(e)}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            
+            if pidfd is not None:
+                select.select([pidfd], [], [], min(delay, remaining))
+            else:
+                time.sleep(min(delay, remaining))
+            delay = min(delay * 1.5, STARTUP_POLL_MAX_INTERVAL)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
 
 
-def start_group(group_name):
+def spawn_group(group_name, watchdog_data):
     """
-    启动指定组的监控
+    启动指定组的监控进程，不等待其完成启动
     
     @param {str} group_name - 组名称
-    @returns {bool} 启动是否成功
+    @param {dict} watchdog_data - 预先加载的watchdog状态，已在运行的组会写入其中
+    @returns {subprocess.Popen|None} 新启动的子进程，该组监控已在运行时返回None
     """
     print(f"正在启动 {group_name} 监控...")
     
-    # 检查PID文件
-    pid_file = os.path.join(project_root, 'data', f"{group_name}.pid")
-    if os.path.exists(pid_file):
+    # 检查PID文件，监控进程持有其排他锁，锁仍被持有即说明该组监控正在运行
+    pid_file = os.path.join(DATA_DIR, f"{group_name}.pid")
+    locked = utils.is_pid_file_locked(pid_file)
+    pid = utils.load_pid(group_name)
+    if locked:
+        print(f"{group_name} 监控已经在运行，PID: {pid}")
+        # 更新watchdog状态
+        update_watchdog_status(group_name, pid, watchdog_data)
+        return None
+    
+    if pid:
+        # 不支持flock的平台上，检查进程是否真的在运行
+        if locked is None and utils.is_process_running(pid):
+            # 进一步验证这确实是我们的监控进程(直接读取/proc/<pid>/cmdline)
+            if utils.is_monitor_process(pid, group_name):
+                print(f"{group_name} 监控已经在运行，PID: {pid}")
+                # 更新watchdog状态
+                update_watchdog_status(group_name, pid, watchdog_data)
+                return None
+            print(f"发现PID文件但进程({pid})不是监控进程，将删除PID文件并重新启动")
+        else:
+            # PID文件未被锁定或进程不存在，删除PID文件
+            print(f"PID文件指向的进程({pid})已不再运行，将删除过期的PID文件")
+        
         try:
-            with open(pid_file, 'r') as f:
-                pid = int(f.read().strip())
-            
-            # 更严格地检查进程是否真的在运行
-            if pid and utils.is_process_running(pid):
-                # 进一步验证这确实是我们的监控进程
-                try:
-                    process = psutil.Process(pid)
-                    cmdline = process.cmdline()
-                    
-                    # 检查命令行是否包含当前组的监控脚本
-                    if any(f"monitor_{group_name}.py" in cmd for cmd in cmdline):
-                        print(f"{group_name} 监控已经在运行，PID: {pid}")
-                        # 更新watchdog状态
-                        update_watchdog_status(group_name, pid)
-                        return True
-                    else:
-                        print(f"发现PID文件但进程({pid})不是监控进程，将删除PID文件并重新启动")
-                        os.remove(pid_file)
-                except Exception as e:
-                    print(f"验证进程时出错: {str(e)}，将删除PID文件并重新启动")
-                    os.remove(pid_file)
-            else:
-                # PID文件存在但进程不存在，删除PID文件
-                print(f"PID文件指向的进程({pid})不存在，将删除过期的PID文件")
-                os.remove(pid_file)
-        except Exception as e:
-            print(f"读取PID文件出错: {str(e)}，将删除PID文件")
-            try:
-                os.remove(pid_file)
-            except:
-                pass
+            os.remove(pid_file)
+        except FileNotFoundError:
+            pass
     
     # 检查是否因超过最大重启次数而停止
-    watchdog_status_path = os.path.join(project_root, 'data', 'watchdog.json')
-    if os.path.exists(watchdog_status_path):
-        try:
-            with open(watchdog_status_path, 'r', encoding='utf-8') as f:
-                watchdog_data = json.load(f)
-                
-            # 如果该组存在且状态显示已超过最大重启次数
-            if (group_name in watchdog_data and 
-                'status' in watchdog_data[group_name] and 
-                'restart_count' in watchdog_data[group_name] and
-                watchdog_data[group_name]['status'] == "已停止 - 超过最大重启次数"):
-                
-                print(f"{group_name} 监控之前因超过最大重启次数而停止，正在重置状态...")
-                # 不需要额外处理，下面的update_watchdog_status会重置状态
-        except Exception as e:
-            print(f"读取watchdog状态文件时出错: {str(e)}")
+    if watchdog_data.get(group_name, {}).get('status') == "已停止 - 超过最大重启次数":
+        print(f"{group_name} 监控之前因超过最大重启次数而停止，正在重置状态...")
+        # 不需要额外处理，下面的update_watchdog_status会重置状态
     
     # 组装启动命令
     python_executable = sys.executable
-    script_path = os.path.join(script_dir, f"monitor_{group_name}.py")
+    script_path = os.path.join(script_dir, "monitor_group.py")
     
-    try:
-        # 启动进程，确保完全独立并能在SSH断开后继续运行
-        logs_dir = os.path.join(project_root, 'logs', group_name)
-        os.makedirs(logs_dir, exist_ok=True)
-        log_file = os.path.join(logs_dir, "startup.log")
-        
-        # 创建启动脚本包装器，确保子进程能忽略SIGHUP信号
-        wrapper_script = os.path.join(project_root, 'data', f"start_{group_name}_wrapper.py")
-        with open(wrapper_script, 'w') as f:
-            f.write(f"""#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-# 启动包装脚本 - 自动生成
-import os
-import sys
-import signal
+    # 启动进程，确保完全独立并能在SSH断开后继续运行
+    logs_dir = os.path.join(LOGS_DIR, group_name)
+    utils.ensure_dir(logs_dir)
+    log_file = os.path.join(logs_dir, "startup.log")
+    
+    with open_startup_log(log_file) as log_f:
+        process = subprocess.Popen(
+            [python_executable, script_path, '--group', group_name],
+            stdout=log_f,
+            stderr=log_f,
+            stdin=subprocess.DEVNULL,
+            start_new_session=True,
+            preexec_fn=_ignore_sighup,
+            cwd=project_root,
+            close_fds=True  # 确保关闭所有继承的文件描述符
+        )
+    
+    return process
 
-# 忽略SIGHUP信号，允许在SSH断开后继续运行
-try:
-    signal.signal(signal.SIGHUP, signal.SIG_IGN)
-except (AttributeError, ValueError):
-    pass
 
-# 启动原始脚本
-os.execv("{python_executable}", ["{python_executable}", "{script_path}"])
-""")
-        
-        # 设置包装脚本可执行权限
-        os.chmod(wrapper_script, 0o755)
-        
-        with open(log_file, 'w') as log_f:
-            process = subprocess.Popen(
-                [python_executable, wrapper_script],
-                stdout=log_f,
-                stderr=log_f,
-                stdin=subprocess.DEVNULL,
-                start_new_session=True,
-                cwd=project_root,
-                close_fds=True  # 确保关闭所有继承的文件描述符
-            )
-        
-        # 等待片刻确认进程启动
-        time.sleep(2)
-        
-        # 检查进程是否成功启动
-        new_pid = utils.load_pid(group_name)
-        if new_pid and utils.is_process_running(new_pid):
-            print(f"{group_name} 监控已成功启动，PID: {new_pid}")
-            # 更新watchdog状态
-            update_watchdog_status(group_name, new_pid)
-            return True
-        else:
-            print(f"{group_name} 监控启动失败")
-            return False
-            
-    except Exception as e:
-        print(f"启动 {group_name} 时出错: {str(e)}")
-        return False
+def verify_group(group_name, process, watchdog_data):
+    """
+    等待新启动的监控进程写入PID文件，确认启动结果
+    
+    @param {str} group_name - 组名称
+    @param {subprocess.Popen} process - spawn_group返回的子进程
+    @param {dict} watchdog_data - 预先加载的watchdog状态，启动结果会写入其中
+    @returns {bool} 启动是否成功
+    """
+    new_pid = wait_for_startup(group_name, process)
+    if new_pid:
+        print(f"{group_name} 监控已成功启动，PID: {new_pid}")
+        # 更新watchdog状态
+        update_watchdog_status(group_name, new_pid, watchdog_data)
+        return True
+    
+    print(f"{group_name} 监控启动失败")
+    return False
 
 
 def start_watchdog():
@@ -367,49 +385,24 @@ def start_watchdog():
     
     try:
         # 使用专用的日志文件
-        logs_dir = os.path.join(project_root, 'logs', 'watchdog')
-        os.makedirs(logs_dir, exist_ok=True)
+        logs_dir = os.path.join(LOGS_DIR, 'watchdog')
+        utils.ensure_dir(logs_dir)
         log_file = os.path.join(logs_dir, 'startup.log')
         
-        # 创建启动脚本包装器，确保子进程能忽略SIGHUP信号
-        wrapper_script = os.path.join(project_root, 'data', "start_watchdog_wrapper.py")
-        with open(wrapper_script, 'w') as f:
-            f.write(f"""#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-# 启动包装脚本 - 自动生成
-import os
-import sys
-import signal
-
-# 忽略SIGHUP信号，允许在SSH断开后继续运行
-try:
-    signal.signal(signal.SIGHUP, signal.SIG_IGN)
-except (AttributeError, ValueError):
-    pass
-
-# 启动原始脚本
-os.execv("{sys.executable}", ["{sys.executable}", "{watchdog_script}"])
-""")
-        
-        # 设置包装脚本可执行权限
-        os.chmod(wrapper_script, 0o755)
-        
-        with open(log_file, 'w') as log_f:
+        with open_startup_log(log_file) as log_f:
             watchdog_process = subprocess.Popen(
-                [sys.executable, wrapper_script],
+                [sys.executable, watchdog_script],
                 stdout=log_f,
                 stderr=log_f,
                 stdin=subprocess.DEVNULL,
                 start_new_session=True,
+                preexec_fn=_ignore_sighup,
                 cwd=project_root,
                 close_fds=True  # 确保关闭所有继承的文件描述符
             )
         
-        # 等待几秒钟确认watchdog进程已成功启动
-        time.sleep(5)
-        
-        # 验证watchdog进程是否真的在运行
-        if utils.is_process_running(watchdog_process.pid):
+        # 等待watchdog进程写入自己的PID文件，确认已成功启动
+        if wait_for_startup('watchdog', watchdog_process):
             print(f"Watchdog进程已成功启动，PID: {watchdog_process.pid}")
             return True
         else:
@@ -448,6 +441,10 @@ def main():
         
         # 在非守护进程模式下设置日志
         setup_logging(args.log_file)
+        
+        # 写入PID文件，daemonize()据此确认守护进程已启动
+        utils.ensure_dir(DATA_DIR)
+        utils.write_pid_file(os.path.join(DATA_DIR, 'daemon.pid'))
     
     # 从全局配置获取监控组列表
     try:
@@ -458,17 +455,35 @@ def main():
         groups = ['group1', 'group2', 'group3', 'group4', 'group5', 'group6']
     
     # 重置所有组的重启计数（自动修复）
+    # watchdog状态只读取一次，所有组的修改在内存中完成后统一写回
+    watchdog_data = _load_watchdog()
+    original_state = json.dumps(watchdog_data, sort_keys=True)
+    
     print("执行预检查：重置所有组的重启计数...")
-    reset_all_restart_counts()
+    reset_all_restart_counts(watchdog_data)
     
-    # 首先启动各组监控，确保所有进程状态稳定
+    # 首先同时启动各组监控，再统一确认启动结果
     success_count = 0
+    spawned = []
     for group in groups:
         try:
-            if start_group(group):
-                success_count += 1
+            process = spawn_group(group, watchdog_data)
         except Exception as e:
-            print(f"启动 {group} 监控组时出现未预期的错误: {str(e)}")
+            print(f"启动 {group} 时出错: {str(e)}")
+            continue
+        
+        if process is None:
+            success_count += 1
+        else:
+            spawned.append((group, process))
+    
+    for group, process in spawned:
+        if verify_group(group, process, watchdog_data):
+            success_count += 1
+    
+    # 状态有变化时才写回
+    if json.dumps(watchdog_data, sort_keys=True) != original_state:
+        _save_watchdog(watchdog_data)
     
     # 等待一段时间，确保所有进程都已经稳定运行
     wait_time = global_config.get('startup_wait_time', 15)
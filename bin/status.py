@@ -7,9 +7,9 @@ WAF监控 - 系统状态查看脚本
 import os
 import sys
 import time
-import json
 import argparse
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加项目根目录到Python路径
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,11 +17,71 @@ project_root = os.path.dirname(script_dir)
 sys.path.insert(0, project_root)
 
 from waf_monitor import utils
-from waf_monitor import crash_handler
+
+# 数据目录
+DATA_DIR = os.path.join(project_root, 'data')
 
 # 定义监控组
 GROUPS = ['group1', 'group2', 'group3', 'group4', 'group5', 'group6']
 
+# 清屏并将光标移到左上角的ANSI转义序列
+_CLEAR = "\x1b[2J\x1b[H"
+
+# JSON文件缓存: 路径 -> ((修改时间, 文件大小), 解析结果)
+_json_cache = {}
+
+
+def load_json_cached(path, summarize=None):
+    """
+    读取JSON文件，文件的修改时间和大小未变化时直接返回上次的解析结果
+    
+    状态文件都是原子替换写入的，读取时无需加锁
+    
+    @param {str} path - JSON文件路径
+    @param {function} summarize - 可选，对解析结果做汇总，缓存中只保留汇总结果
+    @returns {object|None} 解析后的数据(或其汇总)，文件不存在或格式错误时返回None
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        _json_cache.pop(path, None)
+        return None
+    
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _json_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    
+    try:
+        data = utils.load_json(path)
+    except (OSError, ValueError):
+        return None
+    
+    if summarize is not None:
+        data = summarize(data)
+    _json_cache[path] = (key, data)
+    return data
+
+
+def summarize_state(state_data):
+    """
+    统计监控状态数据中的URL数量
+    
+    @param {dict} state_data - 监控状态数据
+    @returns {tuple} (URL总数, 不健康URL数量, 已告警URL数量)
+    """
+    if not state_data:
+        return 0, 0, 0
+    
+    unhealthy_count = 0
+    alerted_count = 0
+    for status in state_data.values():
+        if status.get('count', 0) > 0:
+            unhealthy_count += 1
+        if status.get('alerted', False):
+            alerted_count += 1
+    return len(state_data), unhealthy_count, alerted_count
+
 
 def check_group_status(group_name, show_crash=False):
     """
@@ -39,47 +99,34 @@ def check_group_status(group_name, show_crash=False):
     if pid:
         is_running = utils.is_process_running(pid)
     
-    # 获取监控状态数据
-    state_data = utils.load_state(group_name) or {}
+    # 获取监控URL数量，状态文件未变化时直接复用上次的统计结果
+    state_file = os.path.join(DATA_DIR, f"state_{group_name}.json")
+    url_count, unhealthy_count, alerted_count = (
+        load_json_cached(state_file, summarize_state) or (0, 0, 0)
+    )
     
     # 获取最后心跳时间
-    last_activity_file = os.path.join(project_root, 'data', f"last_activity_{group_name}.json")
+    last_activity_file = os.path.join(DATA_DIR, f"last_activity_{group_name}.json")
     last_activity_time = None
     last_activity_type = None
     
-    if os.path.exists(last_activity_file):
-        try:
-            with open(last_activity_file, 'r', encoding='utf-8') as f:
-                activity_data = json.load(f)
-                timestamp = activity_data.get('timestamp')
-                if timestamp:
-                    try:
-                        last_activity_time = datetime.fromisoformat(timestamp)
-                    except:
-                        last_activity_time = timestamp
-                last_activity_type = activity_data.get('type')
-        except:
-            pass
-    
-    # 获取崩溃信息
+    activity_data = load_json_cached(last_activity_file)
+    if activity_data:
+        timestamp = activity_data.get('timestamp')
+        if timestamp:
+            try:
+                last_activity_time = datetime.fromisoformat(timestamp)
+            except:
+                last_activity_time = timestamp
+        last_activity_type = activity_data.get('type')
+    
+    # 获取崩溃信息(仅当最后活动为崩溃时才有崩溃记录，避免重复读取活动文件)
     crash_info = None
-    if show_crash:
+    if show_crash and last_activity_type == 'crashed':
+        # crash_handler在导入时会加载psutil，只有存在崩溃记录时才需要它
+        from waf_monitor import crash_handler
         crash_info = crash_handler.check_last_crash(group_name)
     
-    # 获取监控URL数量
-    url_count = len(state_data) if state_data else 0
-    
-    # 计算不健康URL数量
-    unhealthy_count = 0
-    alerted_count = 0
-    
-    if state_data:
-        for url, status in state_data.items():
-            if status.get('count', 0) > 0:
-                unhealthy_count += 1
-            if status.get('alerted', False):
-                alerted_count += 1
-    
     # 生成结果
     result = {
         'group': group_name,
@@ -96,6 +143,22 @@ def check_group_status(group_name, show_crash=False):
     return result
 
 
+def collect_group_statuses(groups, show_crash=False):
+    """
+    并行检查多个监控组的状态
+    
+    @param {list} groups - 监控组名称列表
+    @param {bool} show_crash - 是否显示崩溃信息
+    @returns {list} 按groups顺序排列的状态信息
+    """
+    if len(groups) <= 1:
+        return [check_group_status(group, show_crash) for group in groups]
+    
+    # 各组读取的文件互不相同，_json_cache的单键读写在GIL下是原子的，无需加锁
+    with ThreadPoolExecutor(max_workers=min(16, len(groups))) as executor:
+        return list(executor.map(lambda group: check_group_status(group, show_crash), groups))
+
+
 def format_group_status(status, verbose=False):
     """
     格式化组状态信息为可读字符串
@@ -179,14 +242,17 @@ def main():
     
     # 实时监控模式
     if args.watch:
+        # Windows 10+ 控制台需要先执行一次空命令才会启用ANSI转义序列
+        if os.name == 'nt':
+            os.system('')
         try:
             while True:
-                os.system('clear' if os.name == 'posix' else 'cls')
+                sys.stdout.write(_CLEAR)
+                sys.stdout.flush()
                 print(f"WAF监控系统状态 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 print("=" * 70)
                 
-                for group in groups:
-                    status = check_group_status(group, show_crash=True)
+                for status in collect_group_statuses(groups, show_crash=True):
                     print(format_group_status(status, verbose=args.verbose))
                     print("-" * 70)
                 
@@ -199,8 +265,7 @@ def main():
         print(f"WAF监控系统状态 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 70)
         
-        for group in groups:
-            status = check_group_status(group, show_crash=True)
+        for status in collect_group_statuses(groups, show_crash=True):
             print(format_group_status(status, verbose=args.verbose))
             print("-" * 70)
 
@@ -5,13 +5,12 @@ WAF监控 - 停止所有监控组
 """
 
 import os
+import re
 import sys
-import signal
-import time
+import argparse
 import psutil  # 添加psutil库
-import json  # 添加json库
 from datetime import datetime
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加项目根目录到Python路径
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,29 +19,207 @@ sys.path.insert(0, project_root)
 
 from waf_monitor import utils
 
+# 数据目录、watchdog状态文件和PID文件路径
+DATA_DIR = os.path.join(project_root, 'data')
+WATCHDOG_JSON_PATH = os.path.join(DATA_DIR, 'watchdog.json')
+WATCHDOG_PID_FILE = os.path.join(DATA_DIR, 'watchdog.pid')
 
-def stop_group(group_name):
+# SIGTERM后等待进程退出的默认宽限期，以及SIGKILL后的等待时间(秒)
+DEFAULT_GRACE_PERIOD = 5.0
+KILL_WAIT = 1.0
+
+# 需要读取命令行的进程名前缀(小写)：Python解释器，以及setproctitle设置的waf-monitor-*/waf-watchdog
+_CANDIDATE_NAME_PREFIXES = ('python', 'waf-')
+
+# 各组监控进程命令行的正则表达式缓存，见_pattern_for_group()
+_GROUP_PATTERN_CACHE = {}
+
+# watchdog进程命令行：setproctitle设置的进程名，或由Python解释器启动的watchdog.py
+_WATCHDOG_PATTERN = re.compile(r"waf-watchdog|(?:^|\s)\S*python3?(?=\s).*watchdog\.py")
+
+
+def _load_watchdog():
+    """
+    读取watchdog状态文件
+    
+    @returns {dict|None} 各组的监控状态，文件不存在时返回None
+    """
+    try:
+        return utils.load_json(WATCHDOG_JSON_PATH)
+    except FileNotFoundError:
+        return None
+
+
+def _save_watchdog(watchdog_data):
+    """
+    保存watchdog状态文件
+    
+    @param {dict} watchdog_data - 各组的监控状态
+    """
+    utils.save_json_atomic(WATCHDOG_JSON_PATH, watchdog_data)
+
+
+def snapshot_processes():
+    """
+    遍历一次系统进程表，获取可能是监控相关进程的psutil.Process对象和命令行
+    
+    先按进程名过滤，只为Python进程和setproctitle改名后的waf-*进程读取命令行；
+    保留Process对象供后续终止和等待时复用，避免按PID重复构造
+    
+    @returns {list} (psutil.Process, 以空格连接的命令行) 列表
+    """
+    processes = []
+    for proc in psutil.process_iter(['pid', 'name']):
+        name = (proc.info['name'] or '').lower()
+        if not name.startswith(_CANDIDATE_NAME_PREFIXES):
+            continue
+        try:
+            cmdline = proc.cmdline()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            continue
+        if cmdline:
+            processes.append((proc, ' '.join(cmdline)))
+    return processes
+
+
+def _pattern_for_group(group_name):
+    """
+    获取匹配该组监控进程命令行的正则表达式，按组名缓存
+    
+    @param {str} group_name - 组名称
+    @returns {re.Pattern} 编译后的正则表达式
+    """
+    pattern = _GROUP_PATTERN_CACHE.get(group_name)
+    if pattern is None:
+        g = re.escape(group_name)
+        pattern = re.compile(
+            # 明确匹配该组的进程名及监控脚本
+            rf"waf-monitor-{g}"
+            rf"|monitor_group\.py\b.*(?:\s|--group=){g}(?:\s|$)"
+            # 命令行参数包含该组名
+            rf"|GROUP_NAME\s*=\s*['\"]{g}['\"]"
+            # 宽松匹配：Python进程且命令行含有组名和"monitor"
+            rf"|^(?=.*python)(?=.*monitor).*{g}"
+        )
+        _GROUP_PATTERN_CACHE[group_name] = pattern
+    return pattern
+
+
+def match_group_cmdline(cmdline, group_name):
+    """
+    检查命令行是否可能属于该组的监控进程
+    
+    @param {str} cmdline - 以空格连接的命令行
+    @param {str} group_name - 组名称
+    @returns {bool} 可能是该组的监控进程则返回True
+    """
+    return _pattern_for_group(group_name).search(cmdline) is not None
+
+
+def match_watchdog_cmdline(cmdline):
+    """
+    检查命令行是否属于watchdog进程
+    
+    @param {str} cmdline - 以空格连接的命令行
+    @returns {bool} 是watchdog进程则返回True
+    """
+    return _WATCHDOG_PATTERN.search(cmdline) is not None
+
+
+def terminate_processes(procs, grace_period=DEFAULT_GRACE_PERIOD):
+    """
+    终止一组进程：先发送SIGTERM并在宽限期内等待退出，仍在运行的再发送SIGKILL
+    
+    宽限期为0时跳过SIGTERM，直接发送SIGKILL
+    
+    @param {list} procs - psutil.Process列表
+    @param {float} grace_period - SIGTERM后等待进程退出的最长时间(秒)
+    @returns {tuple} (已停止的进程列表, 仍在运行的进程列表)，无法发送信号的进程(如无权限)计入仍在运行
+    """
+    stopped = []
+    # 无法发送信号的进程，不参与等待
+    failed = []
+    alive = list(procs)
+    
+    if grace_period > 0:
+        signaled = []
+        for proc in alive:
+            print(f"向进程 {proc.pid} 发送终止信号 (SIGTERM)")
+            try:
+                proc.terminate()
+            except psutil.NoSuchProcess:
+                pass
+            except psutil.Error as e:
+                print(f"终止进程 {proc.pid} 时出错: {str(e)}")
+                failed.append(proc)
+                continue
+            signaled.append(proc)
+        
+        # 等待进程退出，全部退出时立即返回
+        gone, alive = psutil.wait_procs(signaled, timeout=grace_period)
+        for proc in gone:
+            print(f"进程 {proc.pid} 已成功停止")
+        stopped.extend(gone)
+    
+    if alive:
+        signaled = []
+        for proc in alive:
+            if grace_period > 0:
+                print(f"进程 {proc.pid} 未响应SIGTERM信号，使用SIGKILL强制终止")
+            else:
+                print(f"向进程 {proc.pid} 发送强制终止信号 (SIGKILL)")
+            try:
+                proc.kill()
+            except psutil.NoSuchProcess:
+                pass
+            except psutil.Error as e:
+                print(f"终止进程 {proc.pid} 时出错: {str(e)}")
+                failed.append(proc)
+                continue
+            signaled.append(proc)
+        
+        gone, alive = psutil.wait_procs(signaled, timeout=KILL_WAIT)
+        for proc in gone:
+            print(f"进程 {proc.pid} 已被强制终止")
+        for proc in alive:
+            print(f"警告: 进程 {proc.pid} 无法终止，可能需要手动干预")
+        stopped.extend(gone)
+    
+    return stopped, alive + failed
+
+
+def stop_group(group_name, processes=None, watchdog_data=None, grace_period=DEFAULT_GRACE_PERIOD):
     """
     停止指定组的监控
     
     @param {str} group_name - 组名称
+    @param {list} processes - snapshot_processes()的结果，多个组共用同一次进程表遍历；为None时自行遍历
+    @param {dict} watchdog_data - 预先加载的watchdog状态，只在内存中修改，由调用方统一保存；为None时自行读写文件
+    @param {float} grace_period - SIGTERM后等待进程退出的最长时间(秒)，为0时直接发送SIGKILL
     @returns {bool} 停止是否成功
     """
     print(f"正在停止 {group_name} 监控...")
     group_stopped = False
     found_process = False
-    process_errors = []
-    target_pids = []
+    terminated_count = 0
+    # 目标进程，键为PID，值为psutil.Process
+    target_procs = {}
     
     # 1. 先通过PID文件尝试停止
     pid = utils.load_pid(group_name)
     if pid:
         found_process = True
         print(f"从PID文件找到进程ID: {pid}")
-        target_pids.append(pid)
+        try:
+            target_procs[pid] = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            print(f"进程 {pid} 已不存在，无需终止")
+            terminated_count += 1
+        except Exception as e:
+            print(f"获取进程 {pid} 时出错: {str(e)}")
         
         # PID文件无论如何都要删除，确保清理
-        pid_file = os.path.join(project_root, 'data', f"{group_name}.pid")
+        pid_file = os.path.join(DATA_DIR, f"{group_name}.pid")
         if os.path.exists(pid_file):
             try:
                 os.remove(pid_file)
@@ -54,116 +231,37 @@ def stop_group(group_name):
     
     # 2. 查找所有Python进程，收集可能的目标进程
     try:
-        # 遍历所有进程找到可能的监控进程
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                # 如果进程PID在上面的列表中，跳过它，因为已经被标记为目标
-                if proc.pid in target_pids:
-                    continue
-                
-                # 获取进程名称和命令行
-                proc_cmdline = ' '.join(proc.cmdline()) if proc.cmdline() else ''
-                
-                # 使用多种模式匹配可能的目标进程，提高成功率
-                if any([
-                    # 明确匹配该组的监控脚本名
-                    f"monitor_{group_name}.py" in proc_cmdline,
-                    # 进程名匹配
-                    f"waf-monitor-{group_name}" in proc_cmdline,
-                    # 命令行参数包含该组名
-                    f"GROUP_NAME = '{group_name}'" in proc_cmdline or f'GROUP_NAME = "{group_name}"' in proc_cmdline,
-                    # 宽松匹配：Python进程且命令行含有组名和"monitor"
-                    ("python" in proc_cmdline or "python3" in proc_cmdline) and group_name in proc_cmdline and "monitor" in proc_cmdline 
-                ]):
-                    target_pids.append(proc.pid)
-                    found_process = True
-                    print(f"通过命令行找到 {group_name} 可能的监控进程，PID: {proc.pid}")
-            
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
-                process_errors.append(f"检查进程时出错: {str(e)}")
+        if processes is None:
+            processes = snapshot_processes()
+        
+        # 遍历进程表快照找到可能的监控进程
+        for proc, proc_cmdline in processes:
+            # 如果进程PID已经被标记为目标，跳过它
+            if proc.pid in target_procs:
                 continue
+            
+            if match_group_cmdline(proc_cmdline, group_name):
+                target_procs[proc.pid] = proc
+                found_process = True
+                print(f"通过命令行找到 {group_name} 可能的监控进程，PID: {proc.pid}")
     
     except Exception as e:
         print(f"搜索进程时出错: {str(e)}")
     
     # 3. 尝试终止所有找到的目标进程
-    terminated_count = 0
-    if target_pids:
-        print(f"找到 {len(target_pids)} 个可能的 {group_name} 进程，PID列表: {target_pids}")
+    if target_procs:
+        print(f"找到 {len(target_procs)} 个可能的 {group_name} 进程，PID列表: {list(target_procs)}")
         
-        for pid in target_pids:
-            try:
-                if utils.is_process_running(pid):
-                    # 先尝试使用SIGTERM信号
-                    print(f"向进程 {pid} 发送终止信号 (SIGTERM)")
-                    os.kill(pid, signal.SIGTERM)
-                    
-                    # 等待进程退出
-                    timeout = 5  # 最多等待5秒
-                    for i in range(timeout):
-                        if not utils.is_process_running(pid):
-                            print(f"进程 {pid} 已成功停止")
-                            terminated_count += 1
-                            break
-                        time.sleep(1)
-                    
-                    # 如果进程仍在运行，尝试使用SIGKILL信号强制终止
-                    if utils.is_process_running(pid):
-                        print(f"进程 {pid} 未响应SIGTERM信号，使用SIGKILL强制终止")
-                        os.kill(pid, signal.SIGKILL)
-                        time.sleep(1)
-                        
-                        if not utils.is_process_running(pid):
-                            print(f"进程 {pid} 已被强制终止")
-                            terminated_count += 1
-                        else:
-                            print(f"警告: 进程 {pid} 无法终止，可能需要手动干预")
-                else:
-                    print(f"进程 {pid} 已不存在，无需终止")
-                    terminated_count += 1
-            
-            except Exception as e:
-                print(f"终止进程 {pid} 时出错: {str(e)}")
-    
-    # 4. 使用macOS特定命令尝试查找和终止进程（最后的尝试）
-    if found_process and terminated_count == 0:
-        try:
-            # 在macOS上使用pgrep和pkill尝试终止进程
-            monitor_pattern = f"monitor_{group_name}|waf-monitor-{group_name}"
-            
-            # 尝试使用pgrep查找
-            print(f"尝试使用macOS系统命令查找和终止 {group_name} 进程...")
-            pgrep_result = subprocess.run(["pgrep", "-f", monitor_pattern], 
-                                          stdout=subprocess.PIPE, 
-                                          stderr=subprocess.PIPE,
-                                          text=True)
-            
-            if pgrep_result.returncode == 0 and pgrep_result.stdout.strip():
-                macos_pids = pgrep_result.stdout.strip().split('\n')
-                print(f"使用pgrep找到可能的进程: {macos_pids}")
-                
-                # 尝试使用pkill终止这些进程
-                pkill_result = subprocess.run(["pkill", "-f", monitor_pattern],
-                                             stdout=subprocess.PIPE,
-                                             stderr=subprocess.PIPE)
-                
-                if pkill_result.returncode == 0:
-                    print(f"已使用pkill成功终止 {group_name} 进程")
-                    terminated_count += 1
-                else:
-                    print(f"pkill命令执行失败，尝试强制终止...")
-                    subprocess.run(["pkill", "-9", "-f", monitor_pattern])
-                    print(f"已尝试使用pkill -9强制终止 {group_name} 进程")
-        except Exception as e:
-            print(f"使用系统命令终止进程时出错: {str(e)}")
+        # 所有目标进程一起发送信号、一起等待
+        stopped, _ = terminate_processes(target_procs.values(), grace_period)
+        terminated_count += len(stopped)
     
-    # 5. 更新watchdog.json中的状态
+    # 4. 更新watchdog.json中的状态
     try:
-        watchdog_json_path = os.path.join(project_root, 'data', 'watchdog.json')
-        if os.path.exists(watchdog_json_path):
-            with open(watchdog_json_path, 'r', encoding='utf-8') as f:
-                watchdog_data = json.load(f)
-            
+        standalone = watchdog_data is None
+        if standalone:
+            watchdog_data = _load_watchdog()
+        if watchdog_data is not None:
             # 如果该组存在，更新其状态
             if group_name in watchdog_data:
                 # 记录旧状态
@@ -181,29 +279,27 @@ def stop_group(group_name):
                         watchdog_data[group_name]['restart_count'] = 0
                         print(f"已重置 {group_name} 的重启计数: {old_count} -> 0")
                 
-                # 保存更新后的状态
-                with open(watchdog_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(watchdog_data, f, ensure_ascii=False, indent=2)
-                
                 print(f"已更新 {group_name} 的状态: {old_status} -> 已手动停止")
             else:
                 print(f"警告: {group_name} 在watchdog.json中不存在，创建新条目")
                 # 创建新条目
+                now = datetime.now().isoformat()
                 watchdog_data[group_name] = {
                     'group_name': group_name,
                     'pid': None,
                     'status': "已手动停止",
                     'restart_count': 0,
-                    'last_check_time': datetime.now().isoformat(),
-                    'last_start_time': datetime.now().isoformat(),
+                    'last_check_time': now,
+                    'last_start_time': now,
                     'was_restarted': False,
                     'need_alert': False
                 }
-                # 保存更新后的状态
-                with open(watchdog_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(watchdog_data, f, ensure_ascii=False, indent=2)
                 
                 print(f"已为 {group_name} 创建新的状态记录")
+            
+            # 单独调用时立即保存
+            if standalone:
+                _save_watchdog(watchdog_data)
     except Exception as e:
         print(f"更新 {group_name} 在watchdog.json中的状态时出错: {str(e)}")
     
@@ -222,59 +318,64 @@ def stop_group(group_name):
     return group_stopped
 
 
-def stop_watchdog():
+def stop_groups(groups, processes=None, watchdog_data=None, grace_period=DEFAULT_GRACE_PERIOD):
+    """
+    并行停止多个监控组，各组的等待过程互相重叠
+    
+    @param {list} groups - 组名称列表
+    @param {list} processes - snapshot_processes()的结果
+    @param {dict} watchdog_data - 预先加载的watchdog状态，各组只修改自己的条目
+    @param {float} grace_period - SIGTERM后等待进程退出的最长时间(秒)
+    @returns {int} 成功停止的组数量
+    """
+    if not groups:
+        return 0
+    
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        results = executor.map(lambda group: stop_group(group, processes, watchdog_data, grace_period), groups)
+        return sum(1 for stopped in results if stopped)
+
+
+def stop_watchdog(processes=None, grace_period=DEFAULT_GRACE_PERIOD):
     """
     停止监控守护进程
     
+    @param {list} processes - snapshot_processes()的结果，为None时自行遍历
+    @param {float} grace_period - SIGTERM后等待进程退出的最长时间(秒)，为0时直接发送SIGKILL
     @returns {bool} 停止是否成功
     """
     print("正在停止监控进程守护程序...")
     
     # 查找watchdog进程
-    watchdog_pid_file = os.path.join(project_root, 'data', 'watchdog.pid')
+    watchdog_pid_file = WATCHDOG_PID_FILE
     watchdog_stopped = False
+    pid_file_pid = None
     
     # 1. 先尝试通过PID文件停止
     try:
         if os.path.exists(watchdog_pid_file):
             with open(watchdog_pid_file, 'r') as f:
                 pid = int(f.read().strip())
+            pid_file_pid = pid
             
             # 检查进程是否存在
             if utils.is_process_running(pid):
-                # 验证这确实是watchdog进程
+                # 验证这确实是watchdog进程：优先复用进程表快照中的Process对象和命令行，
+                # 快照中没有时直接读取/proc/<pid>/cmdline
                 try:
-                    process = psutil.Process(pid)
-                    cmd_valid = False
-                    
-                    try:
-                        cmdline = process.cmdline()
-                        if any('watchdog.py' in cmd for cmd in cmdline):
-                            cmd_valid = True
-                    except:
-                        # 无法获取命令行时，假定进程有效
-                        cmd_valid = True
+                    proc, cmdline = next(((p, cmd) for p, cmd in processes or () if p.pid == pid), (None, None))
+                    if proc is None:
+                        cmdline = utils.get_process_cmdline(pid)
+                    # 无法获取命令行时，假定进程有效
+                    cmd_valid = cmdline is None or 'watchdog.py' in cmdline or 'waf-watchdog' in cmdline
                     
                     if cmd_valid:
-                        # 发送终止信号
-                        print(f"向watchdog守护进程 (PID: {pid}) 发送终止信号...")
-                        os.kill(pid, signal.SIGTERM)
-                        
-                        # 等待进程退出
-                        for i in range(5):  # 最多等待5秒
-                            if not utils.is_process_running(pid):
-                                print("监控进程守护程序已停止")
-                                watchdog_stopped = True
-                                break
-                            time.sleep(1)
-                        
-                        # 如果进程仍然存在，发送强制终止信号
-                        if utils.is_process_running(pid):
-                            print("watchdog进程未响应终止信号，强制终止...")
-                            os.kill(pid, signal.SIGKILL)
-                            time.sleep(1)
-                            print("监控进程守护程序已强制停止")
-                            watchdog_stopped = True
+                        # 终止watchdog守护进程，进程退出时立即返回
+                        print(f"正在终止watchdog守护进程 (PID: {pid})...")
+                        stopped, _ = terminate_processes([proc or psutil.Process(pid)], grace_period)
+                        if stopped:
+                            print("监控进程守护程序已停止")
+                        watchdog_stopped = True
                     else:
                         print(f"PID文件指向的进程 (PID: {pid}) 不是watchdog进程，将删除PID文件")
                 except Exception as e:
@@ -289,54 +390,29 @@ def stop_watchdog():
     except Exception as e:
         print(f"通过PID文件停止监控进程守护程序时出错: {str(e)}")
     
-    # 2. 使用psutil查找所有可能的watchdog进程
+    # 2. 在进程表快照中查找所有可能的watchdog进程
     try:
-        # 获取所有Python进程
-        python_processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                # 只收集Python进程
-                if proc.info['name'] in ['python', 'python3'] or (proc.info['cmdline'] and any(cmd.endswith(('python', 'python3')) for cmd in proc.info['cmdline'])):
-                    python_processes.append(proc)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
+        if processes is None:
+            processes = snapshot_processes()
         
-        # 在Python进程中查找watchdog相关进程
         watchdog_count = 0
-        for proc in python_processes:
-            try:
-                cmd = ' '.join(proc.cmdline()) if proc.cmdline() else ''
-                
-                # 匹配任意标识watchdog的字符串
-                if any(pattern in cmd for pattern in [
-                    'watchdog.py',
-                    'waf-watchdog'
-                ]):
-                    watchdog_count += 1
-                    pid = proc.pid
-                    print(f"找到watchdog进程，PID: {pid}")
-                    
-                    # 尝试终止进程
-                    try:
-                        proc.terminate()
-                        print(f"已向watchdog进程 (PID: {pid}) 发送终止信号")
-                        
-                        # 等待进程退出
-                        try:
-                            proc.wait(timeout=5)
-                            print(f"watchdog进程已停止 (PID: {pid})")
-                            watchdog_stopped = True
-                        except psutil.TimeoutExpired:
-                            # 超时后强制终止
-                            print(f"watchdog进程未响应终止信号，强制终止... (PID: {pid})")
-                            proc.kill()
-                            time.sleep(1)
-                            print(f"watchdog进程已强制停止 (PID: {pid})")
-                            watchdog_stopped = True
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        print(f"无法终止watchdog进程 (PID: {pid})，可能需要更高权限")
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
+        for proc, cmd in processes:
+            # PID文件指向的进程已在上一步处理
+            if proc.pid == pid_file_pid:
+                continue
+            
+            if not match_watchdog_cmdline(cmd):
+                continue
+            
+            watchdog_count += 1
+            print(f"找到watchdog进程，PID: {proc.pid}")
+            
+            # 尝试终止进程，快照之后已退出的进程由terminate_processes直接视为已停止
+            stopped, _ = terminate_processes([proc], grace_period)
+            if stopped:
+                watchdog_stopped = True
+            else:
+                print(f"无法终止watchdog进程 (PID: {proc.pid})")
         
         if watchdog_count > 0:
             print(f"共停止了 {watchdog_count} 个监控进程守护程序")
@@ -353,6 +429,14 @@ def main():
     """
     主函数，停止所有监控组
     """
+    parser = argparse.ArgumentParser(description="WAF监控 - 停止所有监控组")
+    parser.add_argument('--grace-period', type=float, default=DEFAULT_GRACE_PERIOD,
+                        help=f'发送SIGTERM后等待进程退出的最长时间(秒)，默认{DEFAULT_GRACE_PERIOD:g}秒，为0时直接发送SIGKILL')
+    parser.add_argument('--force', action='store_true',
+                        help='跳过SIGTERM，直接发送SIGKILL强制终止(等同于 --grace-period 0)')
+    args = parser.parse_args()
+    grace_period = 0 if args.force else max(args.grace_period, 0)
+    
     # 从全局配置获取监控组列表
     try:
         global_config = utils.load_global_config()
@@ -361,66 +445,71 @@ def main():
         print(f"加载配置失败: {str(e)}")
         groups = ['group1', 'group2', 'group3', 'group4', 'group5', 'group6']
     
+    # watchdog状态只读取一次，各步骤的修改在内存中完成后统一写回
+    try:
+        watchdog_data = _load_watchdog()
+    except Exception as e:
+        print(f"读取watchdog状态文件时出错: {str(e)}")
+        watchdog_data = None
+    
     # 首先停止监控守护进程，避免它重启被停止的进程
+    # 进程表只遍历一次，watchdog和各组共用同一份快照
     print("第1步：停止监控守护进程...")
-    stop_watchdog()
+    processes = snapshot_processes()
+    stop_watchdog(processes, grace_period)
     
     # 然后停止所有监控组
     print("第2步：停止所有监控组...")
-    success_count = 0
-    for group in groups:
-        if stop_group(group):
-            success_count += 1
+    success_count = stop_groups(groups, processes, watchdog_data, grace_period)
     
     # 最后再次检查是否有漏网之鱼
     print("第3步：检查是否有残留进程...")
     try:
-        # 再次检查watchdog进程
-        stop_watchdog()
+        # 只对确实仍有残留进程的watchdog和监控组重新执行停止流程
+        processes = snapshot_processes()
+        if os.path.exists(WATCHDOG_PID_FILE) or any(match_watchdog_cmdline(cmd) for _, cmd in processes):
+            stop_watchdog(processes, grace_period)
         
-        # 检查是否有残留的监控进程
-        for group in groups:
-            stop_group(group)
+        residual_groups = [
+            group for group in groups
+            if any(match_group_cmdline(cmd, group) for _, cmd in processes)
+        ]
+        if residual_groups:
+            print(f"发现残留进程的监控组: {residual_groups}")
+            stop_groups(residual_groups, processes, watchdog_data, grace_period)
+        else:
+            print("未发现残留进程")
             
         # 清理所有PID文件
         print("第4步：清理PID文件...")
-        data_dir = os.path.join(project_root, 'data')
-        for filename in os.listdir(data_dir):
-            if filename.endswith('.pid'):
-                pid_path = os.path.join(data_dir, filename)
+        with os.scandir(DATA_DIR) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.pid') or not entry.is_file():
+                    continue
                 try:
-                    os.remove(pid_path)
-                    print(f"已删除PID文件: {filename}")
+                    os.unlink(entry.path)
+                    print(f"已删除PID文件: {entry.name}")
                 except Exception as e:
-                    print(f"删除PID文件 {filename} 时出错: {str(e)}")
+                    print(f"删除PID文件 {entry.name} 时出错: {str(e)}")
                     
         # 重置watchdog.json中的重启计数器
         print("第5步：重置监控进程重启计数器...")
-        watchdog_json_path = os.path.join(data_dir, 'watchdog.json')
-        if os.path.exists(watchdog_json_path):
-            try:
-                # 读取现有状态
-                with open(watchdog_json_path, 'r', encoding='utf-8') as f:
-                    watchdog_data = json.load(f)
-                
-                # 重置所有组的重启计数
-                updated = False
-                for group in watchdog_data:
-                    if 'restart_count' in watchdog_data[group]:
-                        watchdog_data[group]['restart_count'] = 0
-                        updated = True
-                        print(f"已重置 {group} 的重启计数")
-                
-                # 保存更新后的状态
-                if updated:
-                    with open(watchdog_json_path, 'w', encoding='utf-8') as f:
-                        json.dump(watchdog_data, f, ensure_ascii=False, indent=2)
-                    print(f"已保存更新后的watchdog状态")
-            except Exception as e:
-                print(f"重置重启计数器时出错: {str(e)}")
+        if watchdog_data is not None:
+            for group in watchdog_data:
+                if 'restart_count' in watchdog_data[group]:
+                    watchdog_data[group]['restart_count'] = 0
+                    print(f"已重置 {group} 的重启计数")
     except Exception as e:
         print(f"最终清理时出错: {str(e)}")
     
+    # 统一保存所有步骤对watchdog状态的修改
+    if watchdog_data is not None:
+        try:
+            _save_watchdog(watchdog_data)
+            print(f"已保存更新后的watchdog状态")
+        except Exception as e:
+            print(f"保存watchdog状态文件时出错: {str(e)}")
+    
     print(f"停止完成，共成功停止 {success_count}/{len(groups)} 个监控组")
     
     if success_count < len(groups):
@@ -54,15 +54,18 @@ def toggle_alert(config_file, alert_type, state):
         
         changed = False
         
+        # 只有开关值实际变化时才标记修改，避免重写内容相同的配置文件
         if alert_type in ['wechat', 'all']:
             if 'enable_wechat_alert' in config or alert_type == 'all':
-                config['enable_wechat_alert'] = state
-                changed = True
+                if config.get('enable_wechat_alert') != state:
+                    config['enable_wechat_alert'] = state
+                    changed = True
         
         if alert_type in ['email', 'all']:
             if 'enable_email_alert' in config or alert_type == 'all':
-                config['enable_email_alert'] = state
-                changed = True
+                if config.get('enable_email_alert') != state:
+                    config['enable_email_alert'] = state
+                    changed = True
         
         if changed:
             with open(config_file, 'w', encoding='utf-8') as f:
@@ -8,6 +8,7 @@ import os
 import sys
 import time
 import signal
+import select
 import argparse
 
 # 添加项目根目录到Python路径
@@ -23,6 +24,21 @@ except ImportError:
 from waf_monitor import utils
 from waf_monitor import watchdog
 
+# 进程持续稳定时检查间隔按2的幂逐步放大，最多放大到MAX_BACKOFF_FACTOR倍且不超过MAX_CHECK_INTERVAL秒
+MAX_BACKOFF_FACTOR = 8
+MAX_CHECK_INTERVAL = 300
+
+# 刚发生重启时缩短检查间隔，不低于MIN_CHECK_INTERVAL秒
+MIN_CHECK_INTERVAL = 10
+
+# 自管道：子进程退出(SIGCHLD)时信号处理函数向写端写入一个字节，主循环在读端上等待
+_wakeup_r, _wakeup_w = os.pipe()
+os.set_blocking(_wakeup_w, False)
+
+# 运行中监控进程的pidfd，键为PID。监控进程通常由start_all启动而不是watchdog的子进程，
+# 它们退出时不会产生SIGCHLD，pidfd在进程退出后变为可读，与自管道一起等待
+_pidfds = {}
+
 
 def signal_handler(sig, frame):
     """
@@ -42,6 +58,103 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 
+def sigchld_handler(sig, frame):
+    """
+    SIGCHLD信号处理函数，只写入自管道，回收子进程和检查工作交由主循环完成
+    """
+    try:
+        os.write(_wakeup_w, b'c')
+    except BlockingIOError:
+        # 管道已满，说明主循环已有未处理的唤醒
+        pass
+
+
+def reap_children():
+    """
+    回收所有已退出的子进程(由watchdog重启的监控进程)，避免留下僵尸进程
+    
+    @returns {list} 已回收的子进程PID列表
+    """
+    reaped = []
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            break
+        reaped.append(pid)
+    return reaped
+
+
+def watch_pids(pids):
+    """
+    为运行中的监控进程打开pidfd，并关闭已不再运行的进程的pidfd
+    
+    不支持pidfd的平台(Linux 5.3以下或非Linux)上不做任何操作，退出由定期检查发现
+    
+    @param {set} pids - 运行中的监控进程PID集合
+    """
+    if not hasattr(os, 'pidfd_open'):
+        return
+    
+    for pid in [pid for pid in _pidfds if pid not in pids]:
+        os.close(_pidfds.pop(pid))
+    
+    for pid in pids:
+        if pid not in _pidfds:
+            try:
+                _pidfds[pid] = os.pidfd_open(pid)
+            except OSError:
+                # 进程已退出或内核不支持pidfd，交由下一次检查处理
+                pass
+
+
+def wait_for_next_check(timeout):
+    """
+    等待下一次检查，有子进程或监控进程退出时立即返回
+    
+    不支持SIGCHLD的平台上退化为固定时长的休眠
+    
+    @param {float} timeout - 最长等待时间(秒)
+    @returns {list} 等待期间退出的进程PID列表
+    """
+    if not hasattr(signal, 'SIGCHLD'):
+        time.sleep(timeout)
+        return []
+    
+    ready, _, _ = select.select([_wakeup_r, *_pidfds.values()], [], [], timeout)
+    if _wakeup_r in ready:
+        os.read(_wakeup_r, 64)
+    
+    # pidfd可读表示对应的监控进程已退出
+    exited = []
+    for pid, fd in list(_pidfds.items()):
+        if fd in ready:
+            os.close(_pidfds.pop(pid))
+            exited.append(pid)
+    
+    exited.extend(pid for pid in reap_children() if pid not in exited)
+    return exited
+
+
+def next_check_interval(check_interval, stable_cycles, restarted):
+    """
+    根据进程稳定情况计算下一次检查前的等待时间
+    
+    @param {int} check_interval - 配置的检查间隔(秒)
+    @param {int} stable_cycles - 连续未发生重启的检查次数
+    @param {bool} restarted - 本次检查是否重启过进程
+    @returns {float} 等待时间(秒)
+    """
+    if restarted:
+        # 刚重启过进程，缩短间隔以尽快确认重启结果
+        return min(check_interval, max(check_interval // 6, MIN_CHECK_INTERVAL))
+    
+    factor = min(1 << stable_cycles, MAX_BACKOFF_FACTOR)
+    return max(check_interval, min(check_interval * factor, MAX_CHECK_INTERVAL))
+
+
 def main():
     """
     主函数
@@ -78,8 +191,7 @@ def main():
     
     # 写入当前PID
     try:
-        with open(watchdog_pid_file, 'w') as f:
-            f.write(str(current_pid))
+        utils.write_pid_file(watchdog_pid_file, current_pid)
         print(f"[系统初始化] 已创建watchdog PID文件，PID: {current_pid}")
     except Exception as e:
         print(f"[系统错误] 创建watchdog PID文件时出错: {str(e)}")
@@ -88,6 +200,8 @@ def main():
     # 设置信号处理
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    if hasattr(signal, 'SIGCHLD'):
+        signal.signal(signal.SIGCHLD, sigchld_handler)
     
     try:
         # 加载配置
@@ -110,21 +224,32 @@ def main():
         # 启动主循环并持续运行
         print(f"[系统初始化] 开始主循环监控，每 {check_interval} 秒检查一次进程状态")
         dog.running = True
+        stable_cycles = 0
         
         while True:
             try:
                 # 定期检查PID文件是否存在，如果不存在则重新创建
                 if not os.path.exists(watchdog_pid_file):
                     print(f"[系统维护] watchdog PID文件不存在，正在重新创建...")
-                    with open(watchdog_pid_file, 'w') as f:
-                        f.write(str(current_pid))
+                    utils.write_pid_file(watchdog_pid_file, current_pid)
                     print(f"[系统维护] 已重新创建watchdog PID文件，PID: {current_pid}")
                 
                 # 执行一次检查循环
                 dog.check_all_processes()
+                watch_pids(dog.running_pids())
+                
+                # 进程持续稳定时逐步放大检查间隔，发生重启后缩短
+                if dog.last_check_restarted:
+                    stable_cycles = 0
+                else:
+                    stable_cycles += 1
+                sleep_for = next_check_interval(check_interval, stable_cycles, dog.last_check_restarted)
                 
-                # 等待下一次检查
-                time.sleep(check_interval)
+                # 等待下一次检查，监控进程退出时立即重新检查
+                exited = wait_for_next_check(sleep_for)
+                if exited:
+                    stable_cycles = 0
+                    print(f"[系统状态] 检测到进程退出 (PID: {', '.join(map(str, exited))})，立即重新检查")
                 
             except KeyboardInterrupt:
                 print("[系统操作] 收到中断信号，正在退出...")
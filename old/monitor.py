@@ -1,9 +1,16 @@
 import requests
+from requests.adapters import HTTPAdapter
 from concurrent.futures import ThreadPoolExecutor
 import threading
 import time
 import logging
 import json
+import os
+
+try:
+    import orjson  # 可选依赖，安装后url_health.json的读写更快
+except ImportError:
+    orjson = None
 
 # 从配置文件中读取配置
 with open('config.json', 'r') as file:
@@ -14,6 +21,12 @@ monitor_interval = config['monitor_interval']
 unhealthy_threshold = config['unhealthy_threshold']
 response_timeout = config['response_timeout']  # 从config中读取响应超时时间
 
+# 所有检查线程共用一个Session，复用TCP连接，避免每次请求重新建立连接
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=100, pool_maxsize=100)
+session.mount('http://', adapter)
+session.mount('https://', adapter)
+
 class AlertHandler:
     def __init__(self, wechat_webhook_url):
         self.wechat_webhook_url = wechat_webhook_url
@@ -34,6 +47,7 @@ class AlertHandler:
 url_health = {}
 url_to_waf = {}  # Store URL to WAF mappings
 lock = threading.Lock()
+url_health_dirty = False  # 本轮检查中url_health是否发生变化，未变化时不重写url_health.json
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 health_logger = logging.getLogger("HealthLogger")
@@ -61,8 +75,9 @@ def format_alert_message(url, status_code=None, response_time=None, error=None):
     return alert_message
 
 def check_health(url):
+    global url_health_dirty
     try:
-        response = requests.get(url, timeout=response_timeout)
+        response = session.get(url, timeout=response_timeout)
         status_code = response.status_code
         response_time = response.elapsed.total_seconds()
         alert_message = format_alert_message(url, status_code, response_time)
@@ -70,6 +85,7 @@ def check_health(url):
         if status_code != 200 or response_time > response_timeout:
             with lock:
                 url_health[url]['count'] += 1
+                url_health_dirty = True
                 unhealthy_logger.warning(alert_message)
                 if url_health[url]['count'] % unhealthy_threshold == 0:
                     alert_handler.send_alert(alert_message)
@@ -82,11 +98,14 @@ def check_health(url):
                     alert_handler.send_alert(recovery_message)
                 else:
                     health_logger.info(health_log_message)
+                if url_health[url]['count'] or url_health[url]['alerted']:
+                    url_health_dirty = True
                 url_health[url]['count'] = 0
                 url_health[url]['alerted'] = False
     except Exception as e:
         with lock:
             url_health[url]['count'] += 1
+            url_health_dirty = True
             alert_message = format_alert_message(url, error=str(e))
             unhealthy_logger.warning(alert_message)
             if url_health[url]['count'] % unhealthy_threshold == 0:
@@ -95,13 +114,23 @@ def check_health(url):
 url_health_filename = 'url_health.json'
 
 def save_url_health():
-    with open(url_health_filename, 'w') as file:
-        json.dump(url_health, file)
+    # 先写临时文件再替换，写入中途退出不会留下损坏的url_health.json
+    tmp_filename = url_health_filename + '.tmp'
+    if orjson is not None:
+        payload = orjson.dumps(url_health)
+    else:
+        payload = json.dumps(url_health).encode('utf-8')
+    with open(tmp_filename, 'wb') as file:
+        file.write(payload)
+    os.replace(tmp_filename, url_health_filename)
 
 def load_url_health():
     try:
-        with open(url_health_filename, 'r') as file:
-            return json.load(file)
+        with open(url_health_filename, 'rb') as file:
+            content = file.read()
+        if orjson is not None:
+            return orjson.loads(content)
+        return json.loads(content)
     except FileNotFoundError:
         return None
 
@@ -120,19 +149,22 @@ def load_url_list(file_path):
     return urls
 
 def monitor_urls_with_threadpool_and_persistence(interval):
+    global url_health_dirty
     with ThreadPoolExecutor() as executor:
         while True:
             new_urls = load_url_list('input.txt')  # 重新加载URL列表
             for url in list(url_health.keys()):
                 if url not in new_urls:
                     del url_health[url]
+                    url_health_dirty = True
             for url in new_urls:
                 if url not in url_health:
                     url_health[url] = {'count': 0, 'alerted': False}
-            futures = [executor.submit(check_health, url) for url in new_urls]
-            for future in futures:
-                future.result()
-            save_url_health()
+                    url_health_dirty = True
+            list(executor.map(check_health, new_urls))
+            if url_health_dirty:
+                save_url_health()
+                url_health_dirty = False
             time.sleep(interval)
 
 if __name__ == "__main__":
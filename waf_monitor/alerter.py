@@ -3,6 +3,9 @@
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import re
 import json
 import logging
 import smtplib
@@ -11,6 +14,42 @@ from email.mime.multipart import MIMEMultipart
 from abc import ABC, abstractmethod
 import time
 import inspect
+import threading
+import queue
+import atexit
+
+# SMTP连接池中空闲连接的最长保留时间(秒)，超过后关闭而不再复用
+SMTP_IDLE_TIMEOUT = 100
+
+# 待发送告警队列的容量，队列已满时新的告警被丢弃
+ALERT_QUEUE_SIZE = 1024
+
+# 进程退出时等待队列中剩余告警发送完成的最长时间(秒)
+ALERT_DRAIN_TIMEOUT = 10
+
+# 收到告警后继续等待同批告警的时间(秒)，窗口内同级别同类型的告警合并为一条发送
+ALERT_BATCH_WINDOW = 0.5
+
+# 合并后单条告警的最大字节数，企业微信markdown消息内容不能超过4096字节
+ALERT_BATCH_MAX_BYTES = 3500
+
+# 企业微信webhook请求的(连接, 读取)超时时间(秒)
+WECHAT_TIMEOUT = (3, 5)
+
+# create_alerter读取的配置项，这些配置项都未变化时不需要重新创建告警器
+ALERTER_CONFIG_KEYS = (
+    'wechat_webhook_url', 'enable_wechat_alert',
+    'site_wechat_webhook_url', 'enable_site_wechat_alert',
+    'process_wechat_webhook_url', 'enable_process_wechat_alert',
+    'smtp_server', 'smtp_port', 'sender_email', 'sender_password', 'receiver_email',
+    'site_receiver_email', 'process_receiver_email', 'enable_email_alert',
+)
+
+# 简单的邮箱格式校验：一个@，且域名部分含有"."
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
+# 多个邮箱之间的分隔符(逗号或分号)
+_EMAIL_SEPARATOR_RE = re.compile(r"[,;]")
 
 
 class Alerter(ABC):
@@ -30,11 +69,58 @@ class Alerter(ABC):
         pass
 
 
+def _create_wechat_session():
+    """
+    创建企业微信webhook请求共用的Session，保持与服务器的长连接
+    
+    只对连接失败和网关错误(502/503/504)重试，请求已发出后的读取超时不重试，避免重复告警
+    
+    @returns {requests.Session} Session实例
+    """
+    session = requests.Session()
+    retry = Retry(total=2, connect=2, read=0, backoff_factor=0.2,
+                  status_forcelist=[502, 503, 504], allowed_methods=frozenset(['POST']))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# 所有企业微信告警器共用的Session，站点、进程和通用webhook复用同一组连接
+_WECHAT_SESSION = _create_wechat_session()
+
+
+def _build_wechat_payload_templates():
+    """
+    预先序列化各告警级别的企业微信消息体，发送时只需插入转义后的告警消息
+    
+    @returns {dict} 告警级别到 (消息前半部分, 消息后半部分) 字节串的映射，None对应默认级别
+    """
+    placeholder = "__MSG__"
+    templates = {}
+    for level, prefix in (('error', "🔴 严重告警"), ('warning', "🟠 警告"), (None, "ℹ️ 通知")):
+        payload = json.dumps({
+            "msgtype": "markdown",
+            "markdown": {
+                "content": f"{prefix}\n{placeholder}"
+            }
+        }, ensure_ascii=False).encode('utf-8')
+        head, tail = payload.split(placeholder.encode('ascii'))
+        templates[level] = (head, tail)
+    return templates
+
+
 class WechatAlerter(Alerter):
     """
     企业微信告警实现
     """
     
+    # 请求头对所有告警相同
+    HEADERS = {'Content-Type': 'application/json; charset=utf-8'}
+    
+    # 各告警级别预先序列化的消息体
+    PAYLOAD_TEMPLATES = _build_wechat_payload_templates()
+    
     def __init__(self, webhook_url, logger=None):
         """
         初始化企业微信告警器
@@ -53,27 +139,14 @@ class WechatAlerter(Alerter):
         @param {str} level - 告警级别，如'info', 'warning', 'error'
         @returns {bool} 发送成功返回True，否则返回False
         """
-        headers = {'Content-Type': 'application/json'}
-        
-        # 根据告警级别添加不同的前缀
-        if level == 'error':
-            prefix = "🔴 严重告警"
-        elif level == 'warning':
-            prefix = "🟠 警告"
-        else:
-            prefix = "ℹ️ 通知"
-        
-        data = {
-            "msgtype": "markdown",
-            "markdown": {
-                "content": f"{prefix}\n{message}"
-            }
-        }
+        # 根据告警级别选择带不同前缀的消息体，只对告警消息本身做JSON转义
+        head, tail = self.PAYLOAD_TEMPLATES.get(level) or self.PAYLOAD_TEMPLATES[None]
+        body = head + json.dumps(message)[1:-1].encode('ascii') + tail
         
         try:
-            response = requests.post(self.webhook_url, json=data, headers=headers, timeout=5)
+            response = _WECHAT_SESSION.post(self.webhook_url, data=body, headers=self.HEADERS, timeout=WECHAT_TIMEOUT)
             if response.status_code == 200 and response.json().get('errcode') == 0:
-                self.logger.info(f"企业微信告警发送成功: {message[:100]}...")
+                self.logger.info("企业微信告警发送成功: %.100s...", message)
                 return True
             else:
                 self.logger.error(f"企业微信告警发送失败: {response.text}")
@@ -83,6 +156,118 @@ class WechatAlerter(Alerter):
             return False
 
 
+class _SMTPPool:
+    """
+    SMTP连接池，在多次告警之间复用已登录的连接，省去重复的TCP、TLS握手和登录
+    
+    连接按 (服务器, 端口, 发件人) 分组；过期的空闲连接在下一次acquire时清理
+    """
+    
+    def __init__(self, idle_timeout=SMTP_IDLE_TIMEOUT):
+        """
+        初始化连接池
+        
+        @param {float} idle_timeout - 空闲连接的最长保留时间(秒)
+        """
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+    
+    def acquire(self, key, connect):
+        """
+        获取一个可用连接，优先复用空闲连接
+        
+        @param {tuple} key - 连接分组键 (服务器, 端口, 发件人)
+        @param {callable} connect - 没有可复用连接时用于新建连接的函数
+        @returns {smtplib.SMTP} 已登录的SMTP连接
+        """
+        expired = []
+        candidates = []
+        now = time.monotonic()
+        with self._lock:
+            for pool_key, conns in self._idle.items():
+                fresh = [(conn, ts) for conn, ts in conns if now - ts < self.idle_timeout]
+                expired.extend(conn for conn, ts in conns if now - ts >= self.idle_timeout)
+                if pool_key == key:
+                    candidates = fresh
+                    fresh = []
+                self._idle[pool_key] = fresh
+        
+        for conn in expired:
+            self._close(conn)
+        
+        # 从最近使用的连接开始尝试，用NOOP确认连接仍然有效
+        while candidates:
+            conn, _ = candidates.pop()
+            try:
+                if conn.noop()[0] == 250:
+                    # 其余候选连接放回池中
+                    with self._lock:
+                        self._idle.setdefault(key, []).extend(candidates)
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(conn)
+        
+        return connect()
+    
+    def release(self, key, conn):
+        """
+        将使用完毕的连接放回连接池
+        
+        @param {tuple} key - 连接分组键
+        @param {smtplib.SMTP} conn - SMTP连接
+        """
+        with self._lock:
+            self._idle.setdefault(key, []).append((conn, time.monotonic()))
+    
+    @staticmethod
+    def _close(conn):
+        """
+        关闭连接，忽略连接已断开等错误
+        
+        @param {smtplib.SMTP} conn - SMTP连接
+        """
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+
+# 模块级SMTP连接池，所有EmailAlerter实例共用
+_SMTP_POOL = _SMTPPool()
+
+
+class _TypedWechatAlerter(WechatAlerter):
+    """
+    只处理指定类型告警的企业微信告警器，用于站点/进程告警专用的webhook
+    """
+    
+    def __init__(self, webhook_url, only_type, logger=None):
+        """
+        初始化指定类型的企业微信告警器
+        
+        @param {str} webhook_url - 企业微信机器人的webhook URL
+        @param {str} only_type - 处理的告警类型，'site'或'process'
+        @param {logging.Logger} logger - 日志记录器，如果为None则创建新的
+        """
+        super().__init__(webhook_url, logger)
+        self.only_type = only_type
+    
+    def send_alert(self, message, level='warning', alert_type=None):
+        """
+        发送企业微信告警，其他类型的告警直接忽略
+        
+        @param {str} message - 告警消息
+        @param {str} level - 告警级别，如'info', 'warning', 'error'
+        @param {str} alert_type - 告警类型，None表示一般告警
+        @returns {bool} 发送成功返回True，否则返回False
+        """
+        if alert_type is not None and alert_type != self.only_type:
+            return False
+        return super().send_alert(message, level)
+
+
 class EmailAlerter(Alerter):
     """
     邮件告警实现
@@ -142,27 +327,21 @@ class EmailAlerter(Alerter):
         result = []
         
         if isinstance(email_input, str):
-            # 如果是字符串，检查是否包含多个邮箱（以逗号或分号分隔）
-            if ',' in email_input or ';' in email_input:
-                # 替换所有分号为逗号，然后按逗号分割
-                email_input = email_input.replace(';', ',')
-                emails = [email.strip() for email in email_input.split(',') if email.strip()]
-                
-                # 验证每个邮箱格式
-                for email in emails:
-                    if '@' in email and '.' in email:  # 简单验证邮箱格式
-                        result.append(email)
-                    else:
-                        self.logger.warning(f"忽略无效的邮箱地址: {email}")
-            else:
-                if '@' in email_input and '.' in email_input:  # 简单验证邮箱格式
-                    result.append(email_input.strip())
+            # 如果是字符串，可能包含多个邮箱（以逗号或分号分隔）
+            emails = [email.strip() for email in _EMAIL_SEPARATOR_RE.split(email_input)]
+            
+            # 验证每个邮箱格式
+            for email in emails:
+                if not email:
+                    continue
+                if _EMAIL_RE.fullmatch(email):
+                    result.append(email)
                 else:
-                    self.logger.warning(f"忽略无效的邮箱地址: {email_input}")
+                    self.logger.warning(f"忽略无效的邮箱地址: {email}")
         elif isinstance(email_input, list):
             # 如果已经是列表，直接使用，但验证格式
             for email in email_input:
-                if isinstance(email, str) and '@' in email and '.' in email:  # 简单验证邮箱格式
+                if isinstance(email, str) and _EMAIL_RE.fullmatch(email.strip()):
                     result.append(email.strip())
                 else:
                     self.logger.warning(f"忽略无效的邮箱地址: {email}")
@@ -204,23 +383,10 @@ class EmailAlerter(Alerter):
         else:
             subject = f"{type_prefix}【通知】WAF监控系统通知"
         
-        # 尝试逐个发送给所有收件人
-        success = False
-        
-        for receiver in receivers:
-            try:
-                self.logger.info(f"尝试发送{type_prefix}邮件到: {receiver}")
-                
-                # 为每个收件人单独创建邮件
-                msg = MIMEMultipart()
-                msg['From'] = self.sender_email
-                msg['To'] = receiver  # 单个收件人
-                msg['Subject'] = subject
-                
-                # 使用HTML格式以支持更好的格式化
-                # 预先处理消息中的换行符
-                formatted_message = message.replace('\n', '<br>')
-                html_message = f"""
+        # 邮件正文对所有收件人相同，只生成一次
+        # 使用HTML格式以支持更好的格式化，预先处理消息中的换行符
+        formatted_message = message.replace('\n', '<br>')
+        html_message = f"""
                 <html>
                 <body>
                 <div style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px;">
@@ -229,22 +395,159 @@ class EmailAlerter(Alerter):
                 </body>
                 </html>
                 """
-                
-                msg.attach(MIMEText(html_message, 'html', 'utf-8'))
-                
-                server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=10)
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, [receiver], msg.as_string())
-                self.logger.info(f"成功发送{type_prefix}邮件到: {receiver}")
-                success = True
-                
-                # 关闭连接
-                server.quit()
-            except Exception as e:
-                self.logger.error(f"发送{type_prefix}邮件到 {receiver} 失败: {str(e)}")
+        
+        # 邮件只序列化一次，每个收件人只在开头补充自己的To头
+        msg = MIMEMultipart()
+        msg['From'] = self.sender_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(html_message, 'html', 'utf-8'))
+        msg_body = msg.as_string()
+        
+        # 尝试逐个发送给所有收件人，所有收件人共用一个从连接池获取的SMTP连接
+        success = False
+        server = None
+        pool_key = (self.smtp_server, self.smtp_port, self.sender_email)
+        
+        try:
+            for receiver in receivers:
+                try:
+                    self.logger.info("尝试发送%s邮件到: %s", type_prefix, receiver)
+                    
+                    # 首次发送或上一次发送后连接已断开时才获取连接
+                    if server is None:
+                        server = _SMTP_POOL.acquire(pool_key, self._connect)
+                    server.sendmail(self.sender_email, [receiver], f"To: {receiver}\n{msg_body}")
+                    self.logger.info("成功发送%s邮件到: %s", type_prefix, receiver)
+                    success = True
+                except smtplib.SMTPServerDisconnected as e:
+                    self.logger.error(f"发送{type_prefix}邮件到 {receiver} 失败: {str(e)}")
+                    server = None
+                except Exception as e:
+                    self.logger.error(f"发送{type_prefix}邮件到 {receiver} 失败: {str(e)}")
+        finally:
+            # 连接放回连接池，供后续告警复用
+            if server is not None:
+                _SMTP_POOL.release(pool_key, server)
         
         return success
+    
+    def _connect(self):
+        """
+        建立SMTP连接并完成STARTTLS和登录
+        
+        @returns {smtplib.SMTP} 已登录的SMTP连接
+        """
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=10)
+        try:
+            server.starttls()
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+
+# 待发送告警队列，元素为 (MultiAlerter, 消息, 级别, 告警类型)，None表示停止后台线程
+_alert_queue = queue.Queue(maxsize=ALERT_QUEUE_SIZE)
+
+# 发送告警的后台线程，首次发送告警时启动
+_alert_worker = None
+_alert_worker_lock = threading.Lock()
+
+
+def _collect_alert_batch(first):
+    """
+    收集ALERT_BATCH_WINDOW秒内陆续到达的告警
+    
+    @param {tuple} first - 已从队列取出的第一条告警
+    @returns {tuple} (告警列表, 是否收到退出标记)
+    """
+    batch = [first]
+    deadline = time.monotonic() + ALERT_BATCH_WINDOW
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return batch, False
+        try:
+            item = _alert_queue.get(timeout=remaining)
+        except queue.Empty:
+            return batch, False
+        if item is None:
+            return batch, True
+        batch.append(item)
+
+
+def _merge_alerts(batch):
+    """
+    将同一告警器、同级别、同类型的告警合并为一条，合并后的消息不超过ALERT_BATCH_MAX_BYTES
+    
+    @param {list} batch - 告警列表，每项为 (告警器, 消息, 级别, 类型)
+    @returns {list} 合并后的告警列表
+    """
+    merged = []
+    open_groups = {}
+    for multi_alerter, message, level, alert_type in batch:
+        key = (multi_alerter, level, alert_type)
+        index = open_groups.get(key)
+        if index is not None:
+            combined = merged[index][1] + "\n\n" + message
+            if len(combined.encode('utf-8')) <= ALERT_BATCH_MAX_BYTES:
+                merged[index] = (multi_alerter, combined, level, alert_type)
+                continue
+        open_groups[key] = len(merged)
+        merged.append((multi_alerter, message, level, alert_type))
+    return merged
+
+
+def _alert_worker_loop():
+    """
+    后台线程：批量发送队列中的告警
+    
+    短时间内大量告警(如多个站点同时故障)合并后发送，减少webhook请求和邮件数量；
+    连续的邮件告警通过SMTP连接池复用同一个连接
+    """
+    logger = logging.getLogger(__name__)
+    while True:
+        item = _alert_queue.get()
+        if item is None:
+            return
+        batch, stop = _collect_alert_batch(item)
+        for multi_alerter, message, level, alert_type in _merge_alerts(batch):
+            try:
+                multi_alerter.send_alert_now(message, level, alert_type)
+            except Exception as e:
+                logger.error(f"后台发送告警时出错: {str(e)}")
+        if stop:
+            return
+
+
+def _ensure_alert_worker():
+    """
+    确保发送告警的后台线程正在运行
+    """
+    global _alert_worker
+    if _alert_worker is not None and _alert_worker.is_alive():
+        return
+    with _alert_worker_lock:
+        if _alert_worker is None or not _alert_worker.is_alive():
+            if _alert_worker is None:
+                atexit.register(_drain_alert_queue)
+            _alert_worker = threading.Thread(target=_alert_worker_loop, name="alert-worker", daemon=True)
+            _alert_worker.start()
+
+
+def _drain_alert_queue():
+    """
+    进程退出时发送队列中剩余的告警，最多等待ALERT_DRAIN_TIMEOUT秒
+    """
+    worker = _alert_worker
+    if worker is None or not worker.is_alive():
+        return
+    try:
+        _alert_queue.put(None, timeout=ALERT_DRAIN_TIMEOUT)
+    except queue.Full:
+        return
+    worker.join(ALERT_DRAIN_TIMEOUT)
 
 
 class MultiAlerter(Alerter):
@@ -259,6 +562,11 @@ class MultiAlerter(Alerter):
         @param {list} alerters - 告警器列表
         """
         self.alerters = alerters or []
+        
+        # 各告警器的send_alert是否支持alert_type参数，键为告警器实例
+        self._supports_alert_type = {}
+        for alerter in self.alerters:
+            self._check_alert_type_support(alerter)
     
     def add_alerter(self, alerter):
         """
@@ -268,10 +576,41 @@ class MultiAlerter(Alerter):
         """
         if isinstance(alerter, Alerter):
             self.alerters.append(alerter)
+            self._check_alert_type_support(alerter)
+    
+    def _check_alert_type_support(self, alerter):
+        """
+        检查告警器的send_alert是否支持alert_type参数，结果按告警器缓存
+        
+        @param {Alerter} alerter - 告警器实例
+        @returns {bool} 支持alert_type参数返回True
+        """
+        supported = self._supports_alert_type.get(alerter)
+        if supported is None:
+            supported = hasattr(alerter, 'send_alert') and 'alert_type' in inspect.signature(alerter.send_alert).parameters
+            self._supports_alert_type[alerter] = supported
+        return supported
     
     def send_alert(self, message, level='warning', alert_type=None):
         """
-        向所有配置的告警渠道发送告警
+        将告警加入队列，由后台线程发送，调用方不会被SMTP或HTTP请求阻塞
+        
+        @param {str} message - 告警消息
+        @param {str} level - 告警级别，如'info', 'warning', 'error'
+        @param {str} alert_type - 告警类型，'site'表示站点告警，'process'表示守护进程告警
+        @returns {bool} 成功加入队列返回True，队列已满返回False
+        """
+        _ensure_alert_worker()
+        try:
+            _alert_queue.put_nowait((self, message, level, alert_type))
+            return True
+        except queue.Full:
+            logging.getLogger(__name__).error(f"告警队列已满，丢弃告警: {message[:100]}...")
+            return False
+    
+    def send_alert_now(self, message, level='warning', alert_type=None):
+        """
+        立即向所有配置的告警渠道发送告警
         
         @param {str} message - 告警消息
         @param {str} level - 告警级别，如'info', 'warning', 'error'
@@ -281,7 +620,7 @@ class MultiAlerter(Alerter):
         success = False
         for alerter in self.alerters:
             # 兼容已有告警器，检查是否支持alert_type参数
-            if hasattr(alerter, 'send_alert') and 'alert_type' in inspect.signature(alerter.send_alert).parameters:
+            if self._check_alert_type_support(alerter):
                 if alerter.send_alert(message, level, alert_type):
                     success = True
             else:
@@ -291,6 +630,16 @@ class MultiAlerter(Alerter):
         return success
 
 
+def get_alerter_config(config):
+    """
+    提取配置中与告警器相关的部分，用于判断是否需要重新创建告警器
+    
+    @param {dict} config - 配置字典
+    @returns {dict} 只包含ALERTER_CONFIG_KEYS中已配置项的字典
+    """
+    return {key: config[key] for key in ALERTER_CONFIG_KEYS if key in config}
+
+
 def create_alerter(config, logger=None):
     """
     根据配置创建合适的告警器
@@ -306,28 +655,14 @@ def create_alerter(config, logger=None):
         wechat_alerter = WechatAlerter(config['wechat_webhook_url'], logger)
         multi_alerter.add_alerter(wechat_alerter)
     
-    # 添加站点告警专用的企业微信告警器
+    # 添加站点告警专用的企业微信告警器，只处理站点告警
     if 'site_wechat_webhook_url' in config and config.get('enable_site_wechat_alert', True):
-        site_wechat_alerter = WechatAlerter(config['site_wechat_webhook_url'], logger)
-        # 自定义send_alert方法，只处理站点告警
-        original_send_alert = site_wechat_alerter.send_alert
-        def site_send_alert(message, level='warning', alert_type=None):
-            if alert_type == 'site' or alert_type is None:
-                return original_send_alert(message, level)
-            return False
-        site_wechat_alerter.send_alert = site_send_alert
+        site_wechat_alerter = _TypedWechatAlerter(config['site_wechat_webhook_url'], 'site', logger)
         multi_alerter.add_alerter(site_wechat_alerter)
     
-    # 添加进程告警专用的企业微信告警器
+    # 添加进程告警专用的企业微信告警器，只处理进程告警
     if 'process_wechat_webhook_url' in config and config.get('enable_process_wechat_alert', True):
-        process_wechat_alerter = WechatAlerter(config['process_wechat_webhook_url'], logger)
-        # 自定义send_alert方法，只处理进程告警
-        original_send_alert = process_wechat_alerter.send_alert
-        def process_send_alert(message, level='warning', alert_type=None):
-            if alert_type == 'process' or alert_type is None:
-                return original_send_alert(message, level)
-            return False
-        process_wechat_alerter.send_alert = process_send_alert
+        process_wechat_alerter = _TypedWechatAlerter(config['process_wechat_webhook_url'], 'process', logger)
         multi_alerter.add_alerter(process_wechat_alerter)
     
     # 添加邮件告警器（如果配置了所有必要参数并且开启了）
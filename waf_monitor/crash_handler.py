@@ -10,15 +10,69 @@ import time
 import signal
 import traceback
 import threading
-import json
 import logging
 import atexit
 import datetime
 import psutil
-import io
+import collections
 
 from . import utils
 
+# 非终止信号在SIGNAL_RECORD_WINDOW秒内最多记录SIGNAL_RECORD_LIMIT次，超出部分只计数
+SIGNAL_RECORD_LIMIT = 5
+SIGNAL_RECORD_WINDOW = 10
+
+# 非终止信号记录的调用栈最大帧数
+SIGNAL_STACK_LIMIT = 20
+
+# 异常和终止信号记录的调用栈最大帧数(保留最内层的帧)，以及堆栈文本的最大长度(字符)
+TRACEBACK_LIMIT = 50
+TRACEBACK_MAX_CHARS = 64 * 1024
+
+# 各组的崩溃日志记录器，键为组名
+_crash_loggers = {}
+
+# 已启动的心跳线程，键为组名
+_heartbeat_threads = {}
+_heartbeat_lock = threading.Lock()
+
+# 各组最后活动文件的路径，键为组名
+_activity_files = {}
+
+# 当前进程的psutil.Process对象，复用后cpu_percent()可以直接返回两次调用之间的CPU占用
+_self_process = None
+
+# 当前进程可用的CPU数量(CPU亲和性)，进程运行期间不变，只查询一次
+_cpu_affinity_count = None
+
+
+def _get_self_process():
+    """
+    获取当前进程的psutil.Process对象，首次调用时创建并建立cpu_percent的基准
+    
+    @returns {psutil.Process} 当前进程
+    """
+    global _self_process
+    if _self_process is None:
+        process = psutil.Process()
+        process.cpu_percent(interval=None)
+        _self_process = process
+    return _self_process
+
+
+def get_crash_logger(group_name):
+    """
+    获取组的崩溃日志记录器，按组名缓存
+    
+    @param {str} group_name - 监控组名称
+    @returns {logging.Logger} 崩溃日志记录器
+    """
+    crash_logger = _crash_loggers.get(group_name)
+    if crash_logger is None:
+        crash_logger = logging.getLogger(f"{group_name}_crash")
+        _crash_loggers[group_name] = crash_logger
+    return crash_logger
+
 
 def setup_crash_logging(group_name):
     """
@@ -31,7 +85,7 @@ def setup_crash_logging(group_name):
     logs_dir = os.path.join(project_root, 'logs', group_name)
     os.makedirs(logs_dir, exist_ok=True)
     
-    crash_logger = logging.getLogger(f"{group_name}_crash")
+    crash_logger = get_crash_logger(group_name)
     crash_logger.setLevel(logging.INFO)
     
     # 清除已有的处理器，避免重复
@@ -80,7 +134,7 @@ def save_crash_info(group_name, crash_type, crash_info, additional_info=None):
         "platform": sys.platform,
         "python_version": sys.version,
         "pid": os.getpid(),
-        "process_name": psutil.Process().name(),
+        "process_name": _get_self_process().name(),
         "working_directory": os.getcwd(),
         "timestamp": datetime.datetime.now().isoformat(),
         "memory_usage": get_memory_usage(),
@@ -98,16 +152,24 @@ def save_crash_info(group_name, crash_type, crash_info, additional_info=None):
         "additional_info": additional_info
     }
     
-    # 保存崩溃信息
-    with open(crash_file, 'w', encoding='utf-8') as f:
-        json.dump(crash_data, f, ensure_ascii=False, indent=2)
+    # 保存崩溃信息，紧凑格式并原子写入，避免崩溃过程中留下截断的文件；
+    # 查看时由crash_report.py格式化输出
+    utils.save_json_atomic(crash_file, crash_data)
     
     # 记录到崩溃日志
-    crash_logger = logging.getLogger(f"{group_name}_crash")
+    crash_logger = get_crash_logger(group_name)
     crash_logger.error(f"程序崩溃: 类型={crash_type}, 信息={crash_info}")
     
     # 在最后活动文件中标记崩溃
-    save_last_activity(group_name, "crashed", crash_type)
+    save_last_activity(group_name, "crashed", crash_type, crash_file=os.path.basename(crash_file))
+    
+    # 同时保存只包含崩溃描述的摘要文件，列出崩溃记录时无需解析完整JSON；
+    # 摘要只是辅助信息，写入失败时crash_report.py会回退到读取完整JSON
+    summary_file = crash_file[:-len('.json')] + '.summary'
+    try:
+        utils.write_file_atomic(summary_file, str(crash_info).encode('utf-8'))
+    except OSError as e:
+        crash_logger.warning(f"保存崩溃摘要文件失败: {str(e)}")
 
 
 def get_memory_usage():
@@ -117,7 +179,7 @@ def get_memory_usage():
     @returns {dict} 内存使用信息
     """
     try:
-        process = psutil.Process()
+        process = _get_self_process()
         memory_info = process.memory_info()
         return {
             "rss": memory_info.rss,  # 物理内存
@@ -137,34 +199,53 @@ def get_cpu_usage():
     """
     获取当前进程的CPU使用情况
     
+    CPU使用百分比为距上次调用以来的平均值，不阻塞采样
+    
     @returns {dict} CPU使用信息
     """
+    global _cpu_affinity_count
     try:
-        process = psutil.Process()
+        process = _get_self_process()
+        if _cpu_affinity_count is None and hasattr(process, 'cpu_affinity'):
+            _cpu_affinity_count = len(process.cpu_affinity())
+        cpu_times = process.cpu_times()
         return {
-            "percent": process.cpu_percent(interval=0.1),  # CPU使用百分比
-            "threads": len(process.threads()),  # 线程数量
-            "user_time": process.cpu_times().user,  # 用户态CPU时间
-            "system_time": process.cpu_times().system,  # 系统态CPU时间
-            "affinity": len(process.cpu_affinity()) if hasattr(process, 'cpu_affinity') else None  # CPU亲和性
+            "percent": process.cpu_percent(interval=None),  # CPU使用百分比
+            "threads": process.num_threads(),  # 线程数量
+            "user_time": cpu_times.user,  # 用户态CPU时间
+            "system_time": cpu_times.system,  # 系统态CPU时间
+            "affinity": _cpu_affinity_count  # CPU亲和性
         }
     except Exception as e:
         return {"error": str(e)}
 
 
-def save_last_activity(group_name, activity_type, description=None):
+def get_activity_file(group_name):
+    """
+    获取最后活动文件的路径，按组名缓存
+    
+    @param {str} group_name - 监控组名称
+    @returns {str} 最后活动文件路径
+    """
+    activity_file = _activity_files.get(group_name)
+    if activity_file is None:
+        project_root = utils.get_project_root()
+        activity_file = os.path.join(project_root, 'data', f"last_activity_{group_name}.json")
+        _activity_files[group_name] = activity_file
+    return activity_file
+
+
+def save_last_activity(group_name, activity_type, description=None, crash_file=None):
     """
     保存最后活动信息
     
     @param {str} group_name - 监控组名称
     @param {str} activity_type - 活动类型(heartbeat, crashed, signal, shutdown)
     @param {str} description - 活动描述
+    @param {str} crash_file - 崩溃信息文件名，只在activity_type为crashed时记录
     """
-    project_root = utils.get_project_root()
-    data_dir = os.path.join(project_root, 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    
-    activity_file = os.path.join(data_dir, f"last_activity_{group_name}.json")
+    # 数据目录不存在时由save_json_atomic创建
+    activity_file = get_activity_file(group_name)
     
     activity_data = {
         "timestamp": datetime.datetime.now().isoformat(),
@@ -172,9 +253,23 @@ def save_last_activity(group_name, activity_type, description=None):
         "description": description,
         "pid": os.getpid()
     }
+    if crash_file:
+        activity_data["crash_file"] = crash_file
     
-    with open(activity_file, 'w', encoding='utf-8') as f:
-        json.dump(activity_data, f, ensure_ascii=False, indent=2)
+    utils.save_json_atomic(activity_file, activity_data)
+
+
+def _truncate_traceback(text):
+    """
+    截断过长的堆栈文本，保留开头和结尾各一半
+    
+    @param {str} text - 堆栈文本
+    @returns {str} 长度不超过TRACEBACK_MAX_CHARS(加省略标记)的堆栈文本
+    """
+    if len(text) <= TRACEBACK_MAX_CHARS:
+        return text
+    half = TRACEBACK_MAX_CHARS // 2
+    return f"{text[:half]}\n...[已截断 {len(text) - 2 * half} 个字符]...\n{text[-half:]}"
 
 
 def setup_excepthook(group_name):
@@ -187,7 +282,10 @@ def setup_excepthook(group_name):
     
     def custom_excepthook(exc_type, exc_value, exc_traceback):
         # 格式化异常信息
-        exception_str = ''.join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+        # 深度递归等情况下堆栈可能非常长，只保留最内层的帧并限制总长度
+        exception_str = _truncate_traceback(''.join(
+            traceback.format_exception(exc_type, exc_value, exc_traceback, limit=-TRACEBACK_LIMIT)
+        ))
         
         # 保存崩溃信息
         save_crash_info(
@@ -201,7 +299,7 @@ def setup_excepthook(group_name):
         )
         
         # 记录到崩溃日志
-        crash_logger = logging.getLogger(f"{group_name}_crash")
+        crash_logger = get_crash_logger(group_name)
         crash_logger.critical(f"未捕获异常: {exc_type.__name__}: {exc_value}\n{exception_str}")
         
         # 调用原始的excepthook
@@ -216,11 +314,37 @@ def setup_signal_handlers(group_name):
     
     @param {str} group_name - 监控组名称
     """
-    crash_logger = logging.getLogger(f"{group_name}_crash")
+    crash_logger = get_crash_logger(group_name)
+    
+    # 各信号最近被记录的时间，以及限流期间未记录的次数
+    recent_signals = collections.defaultdict(collections.deque)
+    suppressed_signals = collections.Counter()
+    
+    def should_record(sig):
+        """
+        非终止信号限流：时间窗口内记录次数已达上限时只计数
+        """
+        now = time.monotonic()
+        recent = recent_signals[sig]
+        while recent and now - recent[0] > SIGNAL_RECORD_WINDOW:
+            recent.popleft()
+        if len(recent) >= SIGNAL_RECORD_LIMIT:
+            suppressed_signals[sig] += 1
+            return False
+        recent.append(now)
+        return True
     
     # 定义信号处理函数
     def signal_handler(sig, frame):
         signal_name = signal.Signals(sig).name
+        
+        if sig not in [signal.SIGINT, signal.SIGTERM]:
+            if not should_record(sig):
+                return
+            suppressed = suppressed_signals.pop(sig, 0)
+            if suppressed:
+                crash_logger.warning(f"信号 {signal_name} 过于频繁，期间有 {suppressed} 次未记录")
+        
         crash_logger.warning(f"收到信号: {signal_name} ({sig})")
         
         if sig in [signal.SIGINT, signal.SIGTERM]:
@@ -228,7 +352,7 @@ def setup_signal_handlers(group_name):
                 group_name,
                 "signal",
                 f"收到终止信号: {signal_name} ({sig})",
-                {"stack_trace": ''.join(traceback.format_stack(frame))}
+                {"stack_trace": _truncate_traceback(''.join(traceback.format_stack(frame, limit=TRACEBACK_LIMIT)))}
             )
             
             # 在最后活动文件中标记信号
@@ -242,7 +366,7 @@ def setup_signal_handlers(group_name):
                 group_name,
                 "signal",
                 f"收到管道破裂信号: {signal_name} ({sig})",
-                {"stack_trace": ''.join(traceback.format_stack(frame))}
+                {"stack_trace": ''.join(traceback.format_stack(frame, limit=SIGNAL_STACK_LIMIT))}
             )
             save_last_activity(group_name, "signal", signal_name)
             crash_logger.warning(f"收到管道破裂信号(SIGPIPE)，程序将继续运行")
@@ -252,7 +376,7 @@ def setup_signal_handlers(group_name):
                 group_name,
                 "signal",
                 f"收到信号: {signal_name} ({sig})",
-                {"stack_trace": ''.join(traceback.format_stack(frame))}
+                {"stack_trace": ''.join(traceback.format_stack(frame, limit=SIGNAL_STACK_LIMIT))}
             )
     
     # 注册信号处理器
@@ -266,15 +390,19 @@ def setup_signal_handlers(group_name):
 
 def start_heartbeat(group_name, interval=10):
     """
-    启动心跳监控线程
+    启动心跳监控线程，同一组只启动一个
+    
+    心跳线程为守护线程，不会阻止进程退出；按固定节拍调度，周期不随心跳本身的耗时漂移
     
     @param {str} group_name - 监控组名称
     @param {int} interval - 心跳间隔(秒)
+    @returns {threading.Thread} 心跳线程
     """
     def heartbeat_thread():
-        crash_logger = logging.getLogger(f"{group_name}_crash")
+        crash_logger = get_crash_logger(group_name)
         crash_logger.info(f"心跳监控线程已启动，间隔 {interval} 秒")
         
+        next_run = time.monotonic()
         while True:
             try:
                 # 记录心跳
@@ -290,16 +418,24 @@ def start_heartbeat(group_name, interval=10):
                 
                 if cpu_usage.get('percent', 0) > 80:
                     crash_logger.warning(f"CPU使用率过高: {cpu_usage.get('percent')}%")
-                
-                # 睡眠到下一个心跳周期
-                time.sleep(interval)
             except Exception as e:
                 crash_logger.error(f"心跳线程异常: {str(e)}")
-                time.sleep(interval)  # 即使出错也保持周期
-    
-    # 创建心跳线程
-    heartbeat_t = threading.Thread(target=heartbeat_thread, daemon=False, name=f"heartbeat-{group_name}")
-    heartbeat_t.start()
+            
+            # 睡眠到下一个心跳周期，即使出错也保持周期；落后超过一个周期时从当前时间重新计算
+            next_run += interval
+            delay = next_run - time.monotonic()
+            if delay < 0:
+                next_run = time.monotonic()
+                delay = 0
+            time.sleep(delay)
+    
+    with _heartbeat_lock:
+        heartbeat_t = _heartbeat_threads.get(group_name)
+        if heartbeat_t is None or not heartbeat_t.is_alive():
+            # 创建心跳线程
+            heartbeat_t = threading.Thread(target=heartbeat_thread, daemon=True, name=f"heartbeat-{group_name}")
+            heartbeat_t.start()
+            _heartbeat_threads[group_name] = heartbeat_t
     
     return heartbeat_t
 
@@ -310,7 +446,7 @@ def setup_exit_handler(group_name):
     
     @param {str} group_name - 监控组名称
     """
-    crash_logger = logging.getLogger(f"{group_name}_crash")
+    crash_logger = get_crash_logger(group_name)
     
     def exit_handler():
         """程序退出时执行的处理函数"""
@@ -327,6 +463,9 @@ def initialize(group_name):
     
     @param {str} group_name - 监控组名称
     """
+    # 建立CPU占用率的采样基准，首次心跳即可得到有效的cpu_percent
+    _get_self_process()
+    
     # 设置崩溃日志
     crash_logger = setup_crash_logging(group_name)
     crash_logger.info(f"崩溃处理系统已初始化: {group_name}")
@@ -359,33 +498,38 @@ def check_last_crash(group_name):
     @param {str} group_name - 监控组名称
     @returns {dict|None} 最后一次崩溃信息，如果没有崩溃则返回None
     """
-    project_root = utils.get_project_root()
-    activity_file = os.path.join(project_root, 'data', f"last_activity_{group_name}.json")
+    activity_file = get_activity_file(group_name)
     
     if not os.path.exists(activity_file):
         return None
     
     try:
-        with open(activity_file, 'r', encoding='utf-8') as f:
-            activity_data = json.load(f)
+        activity_data = utils.load_json(activity_file)
         
         # 如果最后活动是崩溃，返回信息
         if activity_data.get('type') == 'crashed':
             crash_type = activity_data.get('description')
             timestamp = activity_data.get('timestamp')
             
-            # 寻找对应的崩溃文件
-            crash_dir = os.path.join(project_root, 'logs', group_name, 'crashes')
-            if os.path.exists(crash_dir):
+            crash_dir = os.path.join(utils.get_project_root(), 'logs', group_name, 'crashes')
+            
+            # 最后活动中记录了崩溃文件名时直接读取
+            crash_file = activity_data.get('crash_file')
+            if crash_file:
+                try:
+                    return utils.load_json(os.path.join(crash_dir, crash_file))
+                except FileNotFoundError:
+                    pass
+            
+            # 旧版本的最后活动文件没有记录文件名，扫描目录寻找对应的崩溃文件
+            elif os.path.exists(crash_dir):
                 crash_files = [f for f in os.listdir(crash_dir) if f.endswith('.json')]
                 crash_files.sort(reverse=True)  # 按文件名降序排列，最新的在前面
                 
                 for crash_file in crash_files:
                     if crash_type in crash_file:
                         crash_path = os.path.join(crash_dir, crash_file)
-                        with open(crash_path, 'r', encoding='utf-8') as f:
-                            crash_data = json.load(f)
-                        return crash_data
+                        return utils.load_json(crash_path)
             
             # 如果没有找到详细的崩溃文件，返回简单信息
             return {
@@ -411,56 +555,54 @@ def format_last_crash_report(group_name):
     if not crash_data:
         return "未发现崩溃记录"
     
-    output = io.StringIO()
-    
-    output.write("=== 崩溃报告 ===\n\n")
+    parts = ["=== 崩溃报告 ===\n\n"]
     
     # 基本崩溃信息
     if isinstance(crash_data, dict) and 'crash_type' in crash_data:
-        output.write(f"崩溃类型: {crash_data.get('crash_type')}\n")
-        output.write(f"崩溃时间: {crash_data.get('timestamp', '未知')}\n")
-        output.write(f"崩溃信息: {crash_data.get('crash_info', '未知')}\n\n")
+        parts.append(f"崩溃类型: {crash_data.get('crash_type')}\n")
+        parts.append(f"崩溃时间: {crash_data.get('timestamp', '未知')}\n")
+        parts.append(f"崩溃信息: {crash_data.get('crash_info', '未知')}\n\n")
         
         # 系统信息
         sys_info = crash_data.get('system_info', {})
         if sys_info:
-            output.write("=== 系统信息 ===\n")
-            output.write(f"平台: {sys_info.get('platform', '未知')}\n")
-            output.write(f"Python版本: {sys_info.get('python_version', '未知')}\n")
-            output.write(f"进程ID: {sys_info.get('pid', '未知')}\n")
-            output.write(f"进程名称: {sys_info.get('process_name', '未知')}\n")
-            output.write(f"工作目录: {sys_info.get('working_directory', '未知')}\n\n")
+            parts.append("=== 系统信息 ===\n")
+            parts.append(f"平台: {sys_info.get('platform', '未知')}\n")
+            parts.append(f"Python版本: {sys_info.get('python_version', '未知')}\n")
+            parts.append(f"进程ID: {sys_info.get('pid', '未知')}\n")
+            parts.append(f"进程名称: {sys_info.get('process_name', '未知')}\n")
+            parts.append(f"工作目录: {sys_info.get('working_directory', '未知')}\n\n")
             
             # 资源使用情况
             mem_usage = sys_info.get('memory_usage', {})
             if isinstance(mem_usage, dict) and 'readable' in mem_usage:
-                output.write("=== 内存使用 ===\n")
-                output.write(f"物理内存: {mem_usage.get('readable', {}).get('rss', '未知')}\n")
-                output.write(f"虚拟内存: {mem_usage.get('readable', {}).get('vms', '未知')}\n")
-                output.write(f"内存使用率: {mem_usage.get('percent', '未知')}%\n\n")
+                parts.append("=== 内存使用 ===\n")
+                parts.append(f"物理内存: {mem_usage.get('readable', {}).get('rss', '未知')}\n")
+                parts.append(f"虚拟内存: {mem_usage.get('readable', {}).get('vms', '未知')}\n")
+                parts.append(f"内存使用率: {mem_usage.get('percent', '未知')}%\n\n")
             
             cpu_usage = sys_info.get('cpu_usage', {})
             if isinstance(cpu_usage, dict):
-                output.write("=== CPU使用 ===\n")
-                output.write(f"CPU使用率: {cpu_usage.get('percent', '未知')}%\n")
-                output.write(f"线程数: {cpu_usage.get('threads', '未知')}\n\n")
+                parts.append("=== CPU使用 ===\n")
+                parts.append(f"CPU使用率: {cpu_usage.get('percent', '未知')}%\n")
+                parts.append(f"线程数: {cpu_usage.get('threads', '未知')}\n\n")
         
         # 异常详情
         additional_info = crash_data.get('additional_info', {})
         if additional_info:
             if 'exception_type' in additional_info:
-                output.write("=== 异常详情 ===\n")
-                output.write(f"异常类型: {additional_info.get('exception_type', '未知')}\n\n")
+                parts.append("=== 异常详情 ===\n")
+                parts.append(f"异常类型: {additional_info.get('exception_type', '未知')}\n\n")
             
             if 'traceback' in additional_info:
-                output.write("=== 堆栈跟踪 ===\n")
-                output.write(additional_info.get('traceback', '无堆栈信息')+ "\n\n")
+                parts.append("=== 堆栈跟踪 ===\n")
+                parts.append(additional_info.get('traceback', '无堆栈信息')+ "\n\n")
             
             elif 'stack_trace' in additional_info:
-                output.write("=== 堆栈跟踪 ===\n")
-                output.write(additional_info.get('stack_trace', '无堆栈信息')+ "\n\n")
+                parts.append("=== 堆栈跟踪 ===\n")
+                parts.append(additional_info.get('stack_trace', '无堆栈信息')+ "\n\n")
     else:
         # 简单模式
-        output.write(f"崩溃信息: {str(crash_data)}\n")
+        parts.append(f"崩溃信息: {str(crash_data)}\n")
     
-    return output.getvalue() 
\ No newline at end of file
+    return ''.join(parts) 
\ No newline at end of file
@@ -3,16 +3,28 @@
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import threading
 import time
 import json
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from . import utils
 from . import alerter
 
 
+# 并行检查URL的默认最大线程数，检查线程几乎都在等待网络响应，线程数不按CPU核数计算
+MAX_CHECK_WORKERS = 64
+
+# 同一域名默认最多同时进行的检查请求数
+MAX_PER_DOMAIN = 8
+
+# HTTP会话默认保留连接池的域名数，目标中的域名更多时按实际数量扩大
+DEFAULT_POOL_HOSTS = 64
+
+
 class URLMonitor:
     """
     URL监控器类，负责检查URL健康状态并发送告警
@@ -31,32 +43,101 @@ class URLMonitor:
         self.config = config
         self.loggers = loggers
         self.alerter = alerter_instance
+        # 创建当前告警器时使用的告警配置
+        self._alerter_config = alerter.get_alerter_config(config)
         
         # 从配置中获取参数
         self.monitor_interval = config.get('monitor_interval', 60)
         self.unhealthy_threshold = config.get('unhealthy_threshold', 3)
         self.response_timeout = config.get('response_timeout', 5)
+        # 并发参数只在创建监控器时读取
+        self.max_concurrency = config.get('max_concurrency', MAX_CHECK_WORKERS)
+        self.max_per_domain = config.get('max_per_domain', MAX_PER_DOMAIN)
         
         # URL健康状态
         self.url_health = {}
         self.url_to_waf = {}
+        self.url_to_host = {}
+        
+        # 目标文件解析结果缓存，文件(修改时间, 大小)未变化时直接复用
+        self._targets_key = None
+        self._urls = ()
+        self._url_set = frozenset()
+        # url_health最近一次与目标列表同步时目标文件的(修改时间, 大小)
+        self._synced_targets_key = None
+        
+        # 每个域名一个信号量，限制同一域名的并发请求数
+        self._domain_sems = {}
         
-        # 线程锁
+        # 线程锁，只在监控循环增删url_health中的URL时使用；
+        # 每轮检查中每个URL只由一个任务处理，检查任务修改自己的URL状态时不需要加锁
         self.lock = threading.Lock()
         
+        # 各URL最近一次提交的检查任务，上一轮检查未完成的URL本轮不再重复提交
+        self._inflight = {}
+        
+        # 健康状态自上次保存后是否有变化，启动后的第一轮总会保存一次
+        self._state_dirty = True
+        
+        # 所有检查共用的HTTP会话，保持连接以免每次检查都重新建立TCP/TLS连接
+        self.session = requests.Session()
+        self._pool_hosts = 0
+        self._mount_adapter(DEFAULT_POOL_HOSTS)
+        
         # 运行标志
         self.running = True
+        
+        # 监控线程退出事件，线程以任何方式结束时都会被设置
+        self.died_event = threading.Event()
+        # 监控线程退出时调用的回调函数(在监控线程中执行)
+        self.died_callback = None
+    
+    def _mount_adapter(self, pool_hosts):
+        """
+        为HTTP会话挂载连接池适配器，替换并关闭原有的适配器
+        
+        @param {int} pool_hosts - 保留连接池的域名数，域名数超过该值时最久未使用的连接池会被关闭
+        """
+        old_adapter = self.session.adapters.get('https://')
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=self.max_concurrency, pool_block=False)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if old_adapter is not None:
+            old_adapter.close()
+        self._pool_hosts = pool_hosts
     
     def load_targets(self):
         """
-        加载监控目标
+        加载监控目标，目标文件未变化时直接返回上次的结果
         
-        @returns {list} URL列表
+        @returns {tuple} URL列表
         """
         try:
+            target_path = os.path.join(utils.CONF_DIR, f'targets_{self.group_name}.txt')
+            st = os.stat(target_path)
+            targets_key = (st.st_mtime_ns, st.st_size)
+            if targets_key == self._targets_key:
+                return self._urls
+            
             urls, url_to_waf = utils.load_config(self.group_name, 'targets')
             self.url_to_waf = url_to_waf
-            return urls
+            # URL只在目标文件变化时解析一次，检查时直接查表得到域名
+            self.url_to_host = {url: urlsplit(url).netloc for url in urls}
+            hosts = set(self.url_to_host.values())
+            for host in hosts:
+                if host not in self._domain_sems:
+                    self._domain_sems[host] = threading.BoundedSemaphore(self.max_per_domain)
+            
+            # 每个域名都要保留自己的连接池，否则每轮检查都会有连接池被淘汰并重新建立连接
+            host_count = len(hosts)
+            if host_count > self._pool_hosts:
+                self._mount_adapter(host_count)
+                self.loggers['monitor'].info(f"目标包含 {host_count} 个域名，已扩大连接池")
+            # 去除重复的URL，保证每轮检查中每个URL只由一个任务处理
+            self._urls = tuple(dict.fromkeys(urls))
+            self._url_set = frozenset(urls)
+            self._targets_key = targets_key
+            return self._urls
         except Exception as e:
             self.loggers['monitor'].error(f"加载目标文件失败: {str(e)}")
             return []
@@ -66,6 +147,8 @@ class URLMonitor:
         加载健康状态
         """
         state = utils.load_state(self.group_name)
+        # url_health被替换后需要重新与目标列表同步
+        self._synced_targets_key = None
         if state:
             self.loggers['monitor'].info(f"已加载持久化的健康状态")
             self.url_health = state
@@ -74,9 +157,49 @@ class URLMonitor:
     
     def save_state(self):
         """
-        保存健康状态
+        保存健康状态，自上次保存后没有变化时跳过写入
         """
-        utils.save_state(self.group_name, self.url_health)
+        if not self._state_dirty:
+            return
+        # 先清除标记再序列化，序列化期间仍在进行的检查产生的变化会重新标记，下一轮保存
+        self._state_dirty = False
+        try:
+            utils.save_state(self.group_name, self.url_health)
+        except Exception:
+            self._state_dirty = True
+            raise
+    
+    def _request(self, url, health, host):
+        """
+        发送健康检查请求
+        
+        优先使用HEAD请求，不下载响应体；HEAD返回非200时用只读取响应头的GET请求复查，以GET的结果为准。
+        WAF/CDN可能对HEAD返回403、404等而GET正常，两者结果不一致时记录下来，之后直接使用GET请求。
+        同一域名同时进行的请求数不超过max_per_domain
+        
+        @param {str} url - 要检查的URL
+        @param {dict} health - 该URL的健康状态
+        @param {str} host - 该URL的域名
+        @returns {requests.Response} 响应对象
+        """
+        with self._domain_sems[host]:
+            if not health.get('head_ok', True):
+                return self.session.get(url, timeout=self.response_timeout, stream=True)
+            
+            head_response = self.session.head(url, timeout=self.response_timeout, allow_redirects=True)
+            if head_response.status_code == 200:
+                return head_response
+            head_response.close()
+            
+            response = self.session.get(url, timeout=self.response_timeout, stream=True)
+            if response.status_code != head_response.status_code:
+                health['head_ok'] = False
+                self._state_dirty = True
+                self.loggers['monitor'].info(
+                    f"URL的HEAD请求结果与GET不一致(HEAD: {head_response.status_code}, GET: {response.status_code})，"
+                    f"改用GET请求: {url}"
+                )
+            return response
     
     def check_health(self, url):
         """
@@ -84,34 +207,38 @@ class URLMonitor:
         
         @param {str} url - 要检查的URL
         """
+        # 检查开始时取出健康状态和域名，检查期间目标列表更新删除了该URL时，只修改已不再保存的状态
+        health = self.url_health.get(url)
+        host = self.url_to_host.get(url)
+        if health is None or host is None:
+            # 提交检查后目标列表已更新，该URL不再监控
+            return
+        
         retry_count = 0
         max_retries = 3
         retry_delay = 1  # 初始重试延迟(秒)
         
         while retry_count <= max_retries:
             try:
-                # 使用with语句确保请求资源正确释放
-                with requests.get(url, timeout=self.response_timeout) as response:
+                # 使用with语句确保请求资源正确释放，不读取响应体
+                with self._request(url, health, host) as response:
                     status_code = response.status_code
                     response_time = response.elapsed.total_seconds()
                     
-                    waf_info = self.url_to_waf.get(url, "未知WAF")
-                    
                     if status_code != 200 or response_time > self.response_timeout:
-                        with self.lock:
-                            self.url_health[url]['count'] += 1
-                            need_alert = self.url_health[url]['count'] % self.unhealthy_threshold == 0
-                            current_count = self.url_health[url]['count']
-                            # 在锁内更新告警状态
-                            if need_alert:
-                                self.url_health[url]['alerted'] = True
+                        health['count'] += 1
+                        self._state_dirty = True
+                        current_count = health['count']
+                        need_alert = current_count % self.unhealthy_threshold == 0
+                        if need_alert:
+                            health['alerted'] = True
                         
-                        # 锁外执行日志记录和告警发送
+                        waf_info = self.url_to_waf.get(url, "未知WAF")
                         alert_message = alerter.format_url_alert_message(
                             url, waf_info, status_code, response_time
                         )
                         self.loggers['monitor'].warning(
-                            f"URL不健康: {url}, 状态码: {status_code}, 响应时间: {response_time:.6f}s"
+                            "URL不健康: %s, 状态码: %s, 响应时间: %.6fs", url, status_code, response_time
                         )
                         self.loggers['unhealthy'].warning(alert_message)
                         
@@ -122,20 +249,21 @@ class URLMonitor:
                                 f"URL已连续 {current_count} 次不健康，已发送告警: {url}"
                             )
                     else:
-                        with self.lock:
-                            # 检查是否之前状态为告警，需要发送恢复通知
-                            was_alerted = self.url_health[url]['alerted']
-                            # 更新状态
-                            self.url_health[url]['count'] = 0
-                            self.url_health[url]['alerted'] = False
+                        # 检查是否之前状态为告警，需要发送恢复通知
+                        was_alerted = health['alerted']
+                        # 状态有变化时才更新并标记需要保存
+                        if health['count'] or was_alerted:
+                            health['count'] = 0
+                            health['alerted'] = False
+                            self._state_dirty = True
                         
-                        # 锁外执行日志记录
                         self.loggers['health'].info(
-                            f"URL健康: {url}, 状态码: {status_code}, 响应时间: {response_time:.6f}s"
+                            "URL健康: %s, 状态码: %s, 响应时间: %.6fs", url, status_code, response_time
                         )
                         
                         # 如果之前发送过告警，现在恢复健康，则发送恢复通知
                         if was_alerted:
+                            waf_info = self.url_to_waf.get(url, "未知WAF")
                             recovery_message = alerter.format_url_alert_message(
                                 url, waf_info, status_code, response_time, is_recovery=True
                             )
@@ -152,7 +280,7 @@ class URLMonitor:
                 retry_count += 1
                 if retry_count > max_retries:
                     # 所有重试都失败，更新健康状态
-                    self._handle_request_error(url, error_msg)
+                    self._handle_request_error(url, error_msg, health)
                 else:
                     # 指数退避重试
                     time.sleep(retry_delay)
@@ -165,7 +293,7 @@ class URLMonitor:
                 retry_count += 1
                 if retry_count > max_retries:
                     # 所有重试都失败，更新健康状态
-                    self._handle_request_error(url, error_msg)
+                    self._handle_request_error(url, error_msg, health)
                 else:
                     # 指数退避重试
                     time.sleep(retry_delay)
@@ -174,31 +302,30 @@ class URLMonitor:
             except requests.exceptions.RequestException as e:
                 # 其他请求错误，记录并更新健康状态
                 self.loggers['monitor'].warning(f"URL请求错误: {url}, 错误: {str(e)}")
-                self._handle_request_error(url, f"请求错误: {str(e)}")
+                self._handle_request_error(url, f"请求错误: {str(e)}", health)
                 break
                 
             except Exception as e:
                 # 捕获所有其他异常
                 self.loggers['monitor'].error(f"URL检查异常: {url}, 错误: {str(e)}")
-                self._handle_request_error(url, f"未知错误: {str(e)}")
+                self._handle_request_error(url, f"未知错误: {str(e)}", health)
                 break
     
-    def _handle_request_error(self, url, error_msg):
+    def _handle_request_error(self, url, error_msg, health):
         """
         处理请求错误的辅助方法
         
         @param {str} url - 请求的URL
         @param {str} error_msg - 错误信息
+        @param {dict} health - 该URL的健康状态
         """
-        with self.lock:
-            self.url_health[url]['count'] += 1
-            need_alert = self.url_health[url]['count'] % self.unhealthy_threshold == 0
-            current_count = self.url_health[url]['count']
-            # 在锁内更新告警状态
-            if need_alert:
-                self.url_health[url]['alerted'] = True
+        health['count'] += 1
+        self._state_dirty = True
+        current_count = health['count']
+        need_alert = current_count % self.unhealthy_threshold == 0
+        if need_alert:
+            health['alerted'] = True
         
-        # 锁外执行日志记录和告警发送
         waf_info = self.url_to_waf.get(url, "未知WAF")
         alert_message = alerter.format_url_alert_message(
             url, waf_info, error=error_msg
@@ -222,9 +349,12 @@ class URLMonitor:
         # 加载持久化的健康状态
         self.load_state()
         
-        with ThreadPoolExecutor(max_workers=min(32, os.cpu_count() * 4 or 4)) as executor:
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
             while self.running:
                 try:
+                    # 本轮开始时间，监控周期从这里开始计算
+                    cycle_start = time.monotonic()
+                    
                     # 重新加载配置
                     try:
                         global_config = utils.load_global_config()
@@ -240,8 +370,12 @@ class URLMonitor:
                         self.unhealthy_threshold = config.get('unhealthy_threshold', 3)
                         self.response_timeout = config.get('response_timeout', 5)
                         
-                        # 根据当前配置更新告警器
-                        self.alerter = alerter.create_alerter(config, self.loggers.get('alert'))
+                        # 告警配置变化时才重新创建告警器，保留已有的连接
+                        alerter_config = alerter.get_alerter_config(config)
+                        if alerter_config != self._alerter_config:
+                            self.alerter = alerter.create_alerter(config, self.loggers.get('alert'))
+                            self._alerter_config = alerter_config
+                            self.loggers['monitor'].info("告警配置已更新，已重新创建告警器")
                         
                         # 如果配置发生变化，记录日志
                         if (old_interval != self.monitor_interval or 
@@ -269,36 +403,63 @@ class URLMonitor:
                         time.sleep(self.monitor_interval)
                         continue
                     
-                    # 更新URL健康状态字典
+                    # 更新URL健康状态字典，目标文件未变化时跳过
                     try:
-                        with self.lock:
-                            # 删除不再监控的URL
-                            for url in list(self.url_health.keys()):
-                                if url not in urls:
+                        if self._synced_targets_key != self._targets_key:
+                            with self.lock:
+                                # 删除不再监控的URL
+                                removed = self.url_health.keys() - self._url_set
+                                for url in removed:
                                     del self.url_health[url]
-                            
-                            # 添加新的URL
-                            for url in urls:
-                                if url not in self.url_health:
+                                
+                                # 添加新的URL
+                                added = self._url_set - self.url_health.keys()
+                                for url in added:
                                     self.url_health[url] = {'count': 0, 'alerted': False}
+                                
+                                if removed or added:
+                                    self._state_dirty = True
+                                self._synced_targets_key = self._targets_key
                     except Exception as e:
                         self.loggers['monitor'].error(f"更新URL健康状态字典失败: {str(e)}")
                     
                     # 并行检查所有URL
                     try:
                         futures = []
+                        inflight = {}
+                        skipped = 0
                         for url in urls:
+                            previous = self._inflight.get(url)
+                            if previous is not None and not previous.done():
+                                inflight[url] = previous
+                                skipped += 1
+                                continue
                             try:
-                                futures.append(executor.submit(self.check_health, url))
+                                future = executor.submit(self.check_health, url)
                             except Exception as url_e:
                                 self.loggers['monitor'].error(f"提交URL检查任务失败: {url}, 错误: {str(url_e)}")
+                                continue
+                            inflight[url] = future
+                            futures.append(future)
+                        self._inflight = inflight
+                        if skipped:
+                            self.loggers['monitor'].warning(f"{skipped} 个URL的上一轮检查尚未完成，本轮跳过")
                         
-                        # 等待所有检查完成
-                        for future in futures:
-                            try:
-                                future.result()  # 等待检查完成
-                            except Exception as result_e:
-                                self.loggers['monitor'].error(f"获取URL检查结果失败: {str(result_e)}")
+                        # 按完成顺序等待检查结果，整轮最多等待一个监控间隔
+                        try:
+                            for future in as_completed(futures, timeout=self.monitor_interval):
+                                try:
+                                    future.result()
+                                except Exception as result_e:
+                                    self.loggers['monitor'].error(f"获取URL检查结果失败: {str(result_e)}")
+                        except FuturesTimeoutError:
+                            # 取消还未开始的检查，正在进行的检查继续执行，结果在下一轮保存
+                            cancelled = sum(1 for future in futures if future.cancel())
+                            running = sum(1 for future in futures if not future.done())
+                            self.loggers['monitor'].warning(
+                                f"本轮URL检查超过 {self.monitor_interval} 秒未完成，"
+                                f"已取消 {cancelled} 个未开始的检查，{running} 个检查仍在进行"
+                            )
                     except Exception as e:
                         self.loggers['monitor'].error(f"URL检查过程出现异常: {str(e)}")
                     
@@ -308,8 +469,12 @@ class URLMonitor:
                     except Exception as e:
                         self.loggers['monitor'].error(f"保存健康状态失败: {str(e)}")
                     
-                    # 等待下一次监控循环
-                    time.sleep(self.monitor_interval)
+                    # 等待下一次监控循环，本轮的检查耗时计入监控间隔，监控周期不会随检查耗时漂移
+                    sleep_for = cycle_start + self.monitor_interval - time.monotonic()
+                    if sleep_for > 0:
+                        time.sleep(sleep_for)
+                    else:
+                        self.loggers['monitor'].warning(f"本轮监控耗时超过监控间隔 {-sleep_for:.2f} 秒")
                 
                 except Exception as e:
                     self.loggers['monitor'].error(f"监控循环出现异常: {str(e)}")
@@ -324,13 +489,27 @@ class URLMonitor:
                     # 成功执行后重置重试计数
                     self._retry_count = 0
     
+    def _run(self):
+        """
+        监控线程入口，线程结束时设置退出事件并调用回调
+        """
+        try:
+            self.monitor_urls()
+        finally:
+            # 关闭连接池中的空闲连接，线程重新启动时会按需重新建立
+            self.session.close()
+            self.died_event.set()
+            if self.died_callback is not None:
+                self.died_callback()
+    
     def start(self):
         """
         启动监控
         """
         self.running = True
+        self.died_event.clear()
         # 明确设置非守护线程，防止主线程退出导致监控线程结束
-        monitor_thread = threading.Thread(target=self.monitor_urls, daemon=False)
+        monitor_thread = threading.Thread(target=self._run, daemon=False)
         monitor_thread.start()
         # 保存线程引用，避免被垃圾回收
         self._monitor_thread = monitor_thread
@@ -340,6 +519,15 @@ class URLMonitor:
         停止监控
         """
         self.running = False
+    
+    def wait_died(self, timeout=None):
+        """
+        等待监控线程退出
+        
+        @param {float} timeout - 最长等待时间(秒)，0表示只检查不等待
+        @returns {bool} 监控线程是否已退出
+        """
+        return self.died_event.wait(timeout)
 
 
 def create_monitor(group_name):
@@ -7,9 +7,54 @@ import json
 import logging
 import logging.handlers
 import sys
+import queue
+import atexit
 import platform
+import tempfile
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 项目根目录，以及其下的配置目录和数据目录
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONF_DIR = os.path.join(PROJECT_ROOT, 'conf')
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+
+# 当前系统是否提供/proc文件系统
+_HAS_PROC = os.path.isdir('/proc/self')
+
+# 全局配置缓存: (文件修改时间, 配置)
+_global_config_cache = None
+
+# 组配置和目标文件缓存: {文件路径: ((文件修改时间, 文件大小), 解析结果)}
+_config_cache = {}
+
+# 本进程中已确认存在的目录
+_ensured_dirs = set()
+
+# 各日志记录器的后台写日志线程: {记录器名称: QueueListener}
+_log_listeners = {}
+
+
+def ensure_dir(path):
+    """
+    确保目录存在，同一进程内对同一路径只创建一次
+    
+    @param {str} path - 目录路径
+    """
+    if path in _ensured_dirs:
+        return
+    os.makedirs(path, exist_ok=True)
+    _ensured_dirs.add(path)
+
 
 def get_project_root():
     """
@@ -17,28 +62,29 @@ def get_project_root():
     
     @returns {str} 项目根目录的绝对路径
     """
-    # 获取当前模块文件的路径
-    current_file = os.path.abspath(__file__)
-    # 项目根目录是当前文件所在目录的上一级
-    project_root = os.path.dirname(os.path.dirname(current_file))
-    return project_root
+    return PROJECT_ROOT
 
 
 def load_config(group_name, config_type='json'):
     """
     加载指定组的配置文件
     
+    按文件修改时间和大小缓存解析结果，文件未变化时不再重复解析
+    
     @param {str} group_name - 组名称（如group1, group2等）
     @param {str} config_type - 配置文件类型，'json'或'targets'
     @returns {dict|list} 配置数据，json返回字典，targets返回列表
     """
-    project_root = get_project_root()
-    
     if config_type == 'json':
-        config_path = os.path.join(project_root, 'conf', f'{group_name}.json')
+        config_path = os.path.join(CONF_DIR, f'{group_name}.json')
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            st = os.stat(config_path)
+            cached = _config_cache.get(config_path)
+            if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+                return dict(cached[1])
+            config = load_json(config_path)
+            _config_cache[config_path] = ((st.st_mtime_ns, st.st_size), config)
+            return dict(config)
         except FileNotFoundError:
             logging.error(f"配置文件不存在: {config_path}")
             raise
@@ -46,8 +92,13 @@ def load_config(group_name, config_type='json'):
             logging.error(f"配置文件格式错误: {config_path}")
             raise
     elif config_type == 'targets':
-        target_path = os.path.join(project_root, 'conf', f'targets_{group_name}.txt')
+        target_path = os.path.join(CONF_DIR, f'targets_{group_name}.txt')
         try:
+            st = os.stat(target_path)
+            cached = _config_cache.get(target_path)
+            if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+                urls, url_to_waf = cached[1]
+                return list(urls), dict(url_to_waf)
             urls = []
             url_to_waf = {}
             with open(target_path, 'r', encoding='utf-8') as f:
@@ -60,7 +111,8 @@ def load_config(group_name, config_type='json'):
                     waf = parts[1].strip() if len(parts) > 1 else "未知WAF"
                     urls.append(url)
                     url_to_waf[url] = waf
-            return urls, url_to_waf
+            _config_cache[target_path] = ((st.st_mtime_ns, st.st_size), (urls, url_to_waf))
+            return list(urls), dict(url_to_waf)
         except FileNotFoundError:
             logging.error(f"目标文件不存在: {target_path}")
             raise
@@ -72,19 +124,30 @@ def load_global_config():
     """
     加载全局配置文件
     
+    按文件修改时间缓存解析结果，文件未变化时不再重复解析
+    
     @returns {dict} 全局配置数据
     """
-    project_root = get_project_root()
-    global_config_path = os.path.join(project_root, 'conf', 'global.json')
+    global _global_config_cache
+    
+    global_config_path = os.path.join(CONF_DIR, 'global.json')
     
     try:
-        if os.path.exists(global_config_path):
-            with open(global_config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+        mtime_ns = os.stat(global_config_path).st_mtime_ns
+    except FileNotFoundError:
         return {}  # 如果文件不存在，返回空字典
+    
+    if _global_config_cache is not None and _global_config_cache[0] == mtime_ns:
+        return dict(_global_config_cache[1])
+    
+    try:
+        config = load_json(global_config_path)
     except json.JSONDecodeError:
         logging.error(f"全局配置文件格式错误: {global_config_path}")
         raise
+    
+    _global_config_cache = (mtime_ns, config)
+    return dict(config)
 
 
 def merge_configs(global_config, group_config):
@@ -111,8 +174,7 @@ def setup_logging(group_name, log_types=None):
     if log_types is None:
         log_types = ['monitor', 'health', 'alert']
     
-    project_root = get_project_root()
-    logs_dir = os.path.join(project_root, 'logs', group_name)
+    logs_dir = os.path.join(PROJECT_ROOT, 'logs', group_name)
     
     # 确保日志目录存在
     os.makedirs(logs_dir, exist_ok=True)
@@ -120,11 +182,20 @@ def setup_logging(group_name, log_types=None):
     loggers = {}
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     
+    if not _log_listeners:
+        atexit.register(_stop_log_listeners)
+    
     for log_type in log_types:
-        logger = logging.getLogger(f"{group_name}_{log_type}")
+        logger_name = f"{group_name}_{log_type}"
+        logger = logging.getLogger(logger_name)
         logger.setLevel(logging.INFO)
         
-        # 清除已有的处理器，避免重复
+        # 停止原有的后台写日志线程并清除已有的处理器，避免重复
+        old_listener = _log_listeners.pop(logger_name, None)
+        if old_listener is not None:
+            old_listener.stop()
+            for handler in old_listener.handlers:
+                handler.close()
         for handler in logger.handlers[:]:
             logger.removeHandler(handler)
         
@@ -138,18 +209,34 @@ def setup_logging(group_name, log_types=None):
             encoding='utf-8'
         )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
         
         # 添加控制台处理器
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        
+        # 调用方只把日志记录放入队列，由后台线程写文件和控制台，检查线程不会在写日志时互相等待
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+        listener.start()
+        _log_listeners[logger_name] = listener
         
         loggers[log_type] = logger
     
     return loggers
 
 
+def _stop_log_listeners():
+    """
+    进程退出时停止所有后台写日志线程，队列中剩余的日志会先写完
+    """
+    for listener in list(_log_listeners.values()):
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    _log_listeners.clear()
+
+
 def save_pid(group_name, pid=None):
     """
     保存进程ID到PID文件
@@ -160,16 +247,13 @@ def save_pid(group_name, pid=None):
     if pid is None:
         pid = os.getpid()
     
-    project_root = get_project_root()
-    data_dir = os.path.join(project_root, 'data')
-    
     # 确保数据目录存在
-    os.makedirs(data_dir, exist_ok=True)
+    data_dir = DATA_DIR
+    ensure_dir(data_dir)
     
     pid_file = os.path.join(data_dir, f"{group_name}.pid")
     try:
-        with open(pid_file, 'w') as f:
-            f.write(str(pid))
+        write_pid_file(pid_file, pid)
         print(f"已成功写入PID文件: {pid_file}, PID: {pid}")
     except Exception as e:
         print(f"无法写入PID文件 {pid_file}: {str(e)}")
@@ -190,14 +274,46 @@ def load_pid(group_name):
     @param {str} group_name - 组名称
     @returns {int|None} 进程ID，如果文件不存在则返回None
     """
-    project_root = get_project_root()
-    pid_file = os.path.join(project_root, 'data', f"{group_name}.pid")
+    pid_file = os.path.join(DATA_DIR, f"{group_name}.pid")
+    
+    try:
+        fd = os.open(pid_file, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
     
     try:
-        with open(pid_file, 'r') as f:
-            return int(f.read().strip())
-    except (FileNotFoundError, ValueError):
+        return int(os.read(fd, 32))
+    except ValueError:
         return None
+    finally:
+        os.close(fd)
+
+
+def is_pid_file_locked(pid_file):
+    """
+    检查PID文件是否被运行中的进程锁定
+    
+    监控进程在整个生命周期内持有PID文件的flock排他锁，进程以任何方式退出时内核都会自动释放
+    
+    @param {str} pid_file - PID文件路径
+    @returns {bool|None} 已被锁定返回True，未锁定或文件不存在返回False，平台不支持flock时返回None
+    """
+    if fcntl is None:
+        return None
+    
+    try:
+        fd = os.open(pid_file, os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        # 关闭文件描述符同时释放探测时取得的共享锁
+        os.close(fd)
+    return False
 
 
 def is_process_running(pid):
@@ -209,9 +325,29 @@ def is_process_running(pid):
     """
     if pid is None:
         return False
-        
+    
+    # Linux快速路径: 读取一次 /proc/<pid>/stat，文件不存在说明进程不存在，状态字段用于排除僵尸进程
+    if _HAS_PROC:
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            return False
+        state_pos = stat.rfind(b')') + 2
+        return stat[state_pos:state_pos + 1] not in (b'Z', b'X')
+    
+    if os.name == 'posix':
+        # kill(pid, 0) 只需一次系统调用，进程不存在时无需再加载psutil
+        try:
+            os.kill(pid, 0)
+        except PermissionError:
+            # 进程存在，但属于其他用户
+            pass
+        except OSError:
+            return False
+    
     try:
-        # 首先使用psutil检查进程是否存在
+        # 使用psutil检查进程是否存在
         import psutil
         if not psutil.pid_exists(pid):
             return False
@@ -221,9 +357,6 @@ def is_process_running(pid):
         # 检查进程状态是否为running
         if process.status() in [psutil.STATUS_ZOMBIE, psutil.STATUS_DEAD]:
             return False
-            
-        # 尝试获取进程信息，确保可以访问进程
-        process.cpu_percent()
         return True
     except ImportError:
         # 如果没有psutil，回退到传统方法
@@ -253,6 +386,165 @@ def is_process_running(pid):
         return False
 
 
+def read_process_stat(pid):
+    """
+    读取 /proc/<pid>/stat 中的进程状态和启动时间
+    
+    一次读取即可同时判断进程是否存在、是否为僵尸进程，以及PID是否已被其他进程重用
+    
+    @param {int} pid - 进程ID
+    @returns {tuple|None} (状态字符, 启动时间(系统启动后的时钟滴答数))，进程不存在或没有/proc时返回None
+    """
+    if not _HAS_PROC:
+        return None
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # 进程名可能包含空格和括号，从最后一个")"之后开始按空格拆分，状态为第3个字段，启动时间为第22个字段
+    fields = stat[stat.rfind(b')') + 2:].split()
+    return fields[0], int(fields[19])
+
+
+def get_process_cmdline(pid):
+    """
+    获取进程的命令行
+    
+    Linux下直接读取 /proc/<pid>/cmdline，没有/proc的平台回退到psutil
+    
+    @param {int} pid - 进程ID
+    @returns {str|None} 以空格连接的命令行，进程不存在或无法访问时返回None
+    """
+    if _HAS_PROC:
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        return raw.replace(b'\0', b' ').decode('utf-8', 'replace').strip()
+    
+    try:
+        import psutil
+        return ' '.join(psutil.Process(pid).cmdline())
+    except Exception:
+        return None
+
+
+def is_monitor_cmdline(cmdline, group_name):
+    """
+    检查命令行是否属于该组的监控进程
+    
+    同时匹配setproctitle设置的进程名(设置后cmdline会被改写)和 monitor_group.py --group <组名> 的启动方式
+    
+    @param {str} cmdline - 以空格连接的命令行
+    @param {str} group_name - 组名称
+    @returns {bool} 是该组的监控进程则返回True
+    """
+    if f"waf-monitor-{group_name}" in cmdline:
+        return True
+    
+    # 整串查找比逐个参数比较快，不含脚本名时不必拆分命令行
+    if 'monitor_group.py' not in cmdline:
+        return False
+    
+    args = cmdline.split()
+    if not any(arg.endswith('monitor_group.py') for arg in args):
+        return False
+    return group_name in args or f"--group={group_name}" in args
+
+
+def is_monitor_process(pid, group_name):
+    """
+    检查指定PID是否为该组的监控进程
+    
+    @param {int} pid - 进程ID
+    @param {str} group_name - 组名称
+    @returns {bool} 是该组的监控进程则返回True
+    """
+    cmdline = get_process_cmdline(pid)
+    if not cmdline:
+        return False
+    return is_monitor_cmdline(cmdline, group_name)
+
+
+def load_json(path):
+    """
+    读取JSON文件
+    
+    以二进制方式一次读取整个文件，由解析器直接处理UTF-8字节；已安装orjson时优先使用
+    
+    @param {str} path - 文件路径
+    @returns {object} 解析后的数据
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def save_json_atomic(path, data):
+    """
+    原子地写入JSON文件
+    
+    先写入同目录下的临时文件并fsync，再用os.replace替换目标文件，写入中途崩溃不会留下截断的JSON
+    
+    @param {str} path - 目标文件路径
+    @param {dict} data - 要写入的数据
+    """
+    if orjson is not None:
+        payload = orjson.dumps(data)
+    else:
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    write_file_atomic(path, payload)
+
+
+def write_pid_file(path, pid=None):
+    """
+    原子地写入PID文件
+    
+    读取方不会看到被截断的空文件；PID文件在重启后没有意义，因此不执行fsync
+    
+    @param {str} path - PID文件路径
+    @param {int} pid - 进程ID，默认为当前进程
+    """
+    if pid is None:
+        pid = os.getpid()
+    write_file_atomic(path, str(pid).encode('ascii'), fsync=False)
+
+
+def write_file_atomic(path, payload, fsync=True):
+    """
+    原子地写入文件：先写入同目录下的临时文件，再用os.replace替换目标文件
+    
+    @param {str} path - 目标文件路径
+    @param {bytes} payload - 要写入的内容
+    @param {bool} fsync - 替换前是否将临时文件刷到磁盘
+    """
+    dir_path = os.path.dirname(path)
+    prefix = f".{os.path.basename(path)}."
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=dir_path, prefix=prefix, suffix='.tmp')
+    except FileNotFoundError:
+        # 目录不存在(首次写入或被删除)时才创建，正常情况下不产生额外的系统调用
+        os.makedirs(dir_path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dir_path, prefix=prefix, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 def save_state(group_name, state_data):
     """
     保存状态数据到文件
@@ -260,15 +552,9 @@ def save_state(group_name, state_data):
     @param {str} group_name - 组名称
     @param {dict} state_data - 要保存的状态数据
     """
-    project_root = get_project_root()
-    data_dir = os.path.join(project_root, 'data')
-    
-    # 确保数据目录存在
-    os.makedirs(data_dir, exist_ok=True)
-    
-    state_file = os.path.join(data_dir, f"state_{group_name}.json")
-    with open(state_file, 'w', encoding='utf-8') as f:
-        json.dump(state_data, f, ensure_ascii=False, indent=2)
+    # 数据目录不存在时由save_json_atomic创建
+    state_file = os.path.join(DATA_DIR, f"state_{group_name}.json")
+    save_json_atomic(state_file, state_data)
 
 
 def load_state(group_name):
@@ -278,11 +564,9 @@ def load_state(group_name):
     @param {str} group_name - 组名称
     @returns {dict|None} 状态数据，如果文件不存在则返回None
     """
-    project_root = get_project_root()
-    state_file = os.path.join(project_root, 'data', f"state_{group_name}.json")
+    state_file = os.path.join(DATA_DIR, f"state_{group_name}.json")
     
     try:
-        with open(state_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_json(state_file)
     except (FileNotFoundError, json.JSONDecodeError):
         return None 
\ No newline at end of file
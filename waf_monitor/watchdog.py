@@ -5,20 +5,34 @@
 import os
 import time
 import logging
+import logging.handlers
 import subprocess
-import json
 import signal
 import sys
 import psutil
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from . import utils
 from . import alerter
 
 
+# 重启后等待新进程写入PID文件的最长时间(秒)
+RESTART_CONFIRM_TIMEOUT = 2
+
+# 进程信息除检查时间外没有变化时，最多连续跳过保存的检查轮数
+STATE_SAVE_MAX_SKIPS = 10
+
+# watchdog日志器是否已配置，多次创建监控器时只配置一次处理器
+_logger_initialized = False
+
+
 class ProcessInfo:
     """
     进程信息类，存储进程的各种状态信息
     """
+    __slots__ = ('group_name', 'pid', 'status', 'restart_count', 'last_check_time',
+                 'last_check_monotonic', 'last_start_time', 'was_restarted', 'need_alert')
+    
     def __init__(self, group_name, pid=None, status="未知", restart_count=0, 
                  last_check_time=None, last_start_time=None, was_restarted=False, need_alert=True):
         self.group_name = group_name
@@ -26,6 +40,8 @@ class ProcessInfo:
         self.status = status  # 状态: 运行中, 已停止, 未知
         self.restart_count = restart_count  # 重启次数
         self.last_check_time = last_check_time or datetime.now()
+        # 最后检查时间对应的单调时钟读数，只在进程内比较时间间隔使用，不持久化
+        self.last_check_monotonic = None if last_check_time else time.monotonic()
         self.last_start_time = last_start_time or datetime.now()
         self.was_restarted = was_restarted  # 是否是由watchdog重启的
         self.need_alert = need_alert  # 是否需要发送告警
@@ -43,6 +59,11 @@ class ProcessInfo:
             'need_alert': self.need_alert
         }
     
+    def state_key(self):
+        """返回除检查时间外的所有持久化字段，用于判断进程信息是否有变化"""
+        return (self.pid, self.status, self.restart_count, self.last_start_time,
+                self.was_restarted, self.need_alert)
+    
     @classmethod
     def from_dict(cls, data):
         """从字典创建实例"""
@@ -79,12 +100,30 @@ class Watchdog:
         self.logger = logger or logging.getLogger("watchdog")
         self.alerter = alerter_instance
         
+        # 状态文件、各组PID文件和监控脚本的路径只计算一次
+        self._state_file = os.path.join(utils.DATA_DIR, 'watchdog.json')
+        self._pid_files = {group: os.path.join(utils.DATA_DIR, f"{group}.pid") for group in self.groups}
+        self._script_path = os.path.join(utils.PROJECT_ROOT, 'bin', 'monitor_group.py')
+        
         # 进程信息字典，键为组名，值为ProcessInfo实例
         self.processes = {}
         
+        # 最近一次保存时各组的state_key()，以及此后连续跳过保存的次数
+        self._saved_state_key = None
+        self._skipped_saves = 0
+        
+        # 已验证为监控进程的 (PID, 启动时间)，键为组名；PID和启动时间都未变化时不再重复检查命令行
+        self._verified_procs = {}
+        
         # 运行标志
         self.running = False
         
+        # 最近一次check_all_processes()是否尝试过重启进程
+        self.last_check_restarted = False
+        
+        # 本轮检查中待发送的 (告警消息, 告警级别)，所有组检查完成后一起发送
+        self._pending_alerts = []
+        
         # 加载持久化的进程信息
         self.load_state()
     
@@ -93,31 +132,28 @@ class Watchdog:
         加载进程状态信息
         """
         try:
-            project_root = utils.get_project_root()
-            state_file = os.path.join(project_root, 'data', 'watchdog.json')
-            
-            if os.path.exists(state_file):
-                with open(state_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for group_name, process_data in data.items():
-                        self.processes[group_name] = ProcessInfo.from_dict(process_data)
-                self.logger.info("[系统初始化] 已加载持久化的进程状态信息")
+            data = utils.load_json(self._state_file)
+            for group_name, process_data in data.items():
+                self.processes[group_name] = ProcessInfo.from_dict(process_data)
+            self.logger.info("[系统初始化] 已加载持久化的进程状态信息")
+        except FileNotFoundError:
+            pass
         except Exception as e:
             self.logger.error(f"[系统错误] 加载进程状态信息失败: {str(e)}")
     
     def save_state(self):
         """
         保存进程状态信息
+        
+        @returns {bool} 保存成功返回True
         """
         try:
-            project_root = utils.get_project_root()
-            state_file = os.path.join(project_root, 'data', 'watchdog.json')
-            
-            with open(state_file, 'w', encoding='utf-8') as f:
-                data = {group: process.to_dict() for group, process in self.processes.items()}
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            data = {group: process.to_dict() for group, process in self.processes.items()}
+            utils.save_json_atomic(self._state_file, data)
+            return True
         except Exception as e:
             self.logger.error(f"[系统错误] 保存进程状态信息失败: {str(e)}")
+            return False
     
     def check_process(self, group_name):
         """
@@ -142,17 +178,12 @@ class Watchdog:
         # 更新PID
         self.processes[group_name].pid = pid
         self.processes[group_name].last_check_time = datetime.now()
+        self.processes[group_name].last_check_monotonic = time.monotonic()
         
         # 检查进程是否存在
         if pid is None:
-            # 检查数据目录中是否存在PID文件，如果存在但内容为空或无效，则移除它
-            pid_file = os.path.join(utils.get_project_root(), 'data', f"{group_name}.pid")
-            if os.path.exists(pid_file):
-                try:
-                    os.remove(pid_file)
-                    self.logger.info(f"[系统维护] 已清理无效PID文件: {pid_file}")
-                except Exception as e:
-                    self.logger.error(f"[系统错误] 删除PID文件失败: {str(e)}")
+            # 如果PID文件存在但内容为空或无效，则移除它
+            self._remove_pid_file(group_name)
             
             # 检查当前状态和上一次状态，判断是否是手动停止
             current_status = self.processes[group_name].status
@@ -170,29 +201,38 @@ class Watchdog:
             
             return False
         
-        # 使用psutil更严格地检查进程是否真的在运行
+        # 更严格地检查进程是否真的在运行
         try:
-            process = psutil.Process(pid)
-            
-            # 检查进程命令行来验证这确实是我们的监控进程
-            cmdline = process.cmdline()
-            monitor_script_name = f"monitor_{group_name}.py"
+            # Linux下一次读取 /proc/<pid>/stat 得到进程状态和启动时间
+            stat = utils.read_process_stat(pid)
+            if stat is None:
+                # 进程不存在，或者没有/proc时由is_process_running回退到psutil检查
+                if not utils.is_process_running(pid):
+                    raise psutil.NoSuchProcess(pid)
+            elif stat[0] in (b'Z', b'X'):
+                raise psutil.ZombieProcess(pid)
             
-            # 如果进程存在但不是我们的监控进程，删除PID文件并报告不存在
-            if not any(monitor_script_name in cmd for cmd in cmdline):
-                self.logger.info(f"[系统维护] 清理过期PID文件: PID {pid} 已不再与 {group_name} 监控进程关联")
-                pid_file = os.path.join(utils.get_project_root(), 'data', f"{group_name}.pid")
-                if os.path.exists(pid_file):
-                    try:
-                        os.remove(pid_file)
-                    except Exception as e:
-                        self.logger.error(f"[系统错误] 删除PID文件失败: {str(e)}")
+            # 同一进程(PID和启动时间均未变化)的命令行已验证过，不再重复读取
+            if stat is None or self._verified_procs.get(group_name) != (pid, stat[1]):
+                # 检查进程命令行来验证这确实是我们的监控进程
+                cmdline = utils.get_process_cmdline(pid)
+                if cmdline is None:
+                    raise psutil.NoSuchProcess(pid)
                 
-                self.processes[group_name].status = "已停止"
-                return False
+                # 如果进程存在但不是我们的监控进程，删除PID文件并报告不存在
+                if not utils.is_monitor_cmdline(cmdline, group_name):
+                    self.logger.info(f"[系统维护] 清理过期PID文件: PID {pid} 已不再与 {group_name} 监控进程关联")
+                    self._verified_procs.pop(group_name, None)
+                    self._remove_pid_file(group_name)
+                    
+                    self.processes[group_name].status = "已停止"
+                    return False
                 
+                if stat is not None:
+                    self._verified_procs[group_name] = (pid, stat[1])
+            
             # 确认是我们的监控进程，并且正在运行
-            self.logger.debug(f"[正常状态] 进程 {group_name} 正常运行中，PID: {pid}")
+            self.logger.debug("[正常状态] 进程 %s 正常运行中，PID: %s", group_name, pid)
             
             # 如果进程从已停止状态变为运行中，可能是被手动启动，重置重启计数
             if self.processes[group_name].status == "已停止" or self.processes[group_name].status == "已停止 - 超过最大重启次数" or self.processes[group_name].status == "已手动停止":
@@ -205,19 +245,54 @@ class Watchdog:
             
         except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
             self.logger.warning(f"检查进程 {pid} 时出错: {str(e)}")
+            self._verified_procs.pop(group_name, None)
             
             # PID文件存在但进程不存在或无法访问，删除PID文件
-            pid_file = os.path.join(utils.get_project_root(), 'data', f"{group_name}.pid")
-            if os.path.exists(pid_file):
-                try:
-                    os.remove(pid_file)
-                    self.logger.info(f"已删除无效的PID文件: {pid_file}")
-                except Exception as e_file:
-                    self.logger.error(f"删除PID文件失败: {str(e_file)}")
+            self._remove_pid_file(group_name)
             
             self.processes[group_name].status = "已停止"
             return False
     
+    def _remove_pid_file(self, group_name):
+        """
+        删除指定组的无效PID文件，文件不存在时不做任何操作
+        
+        @param {str} group_name - 监控组名称
+        """
+        pid_file = self._pid_files[group_name]
+        try:
+            os.unlink(pid_file)
+            self.logger.info(f"[系统维护] 已清理无效PID文件: {pid_file}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.error(f"[系统错误] 删除PID文件失败: {str(e)}")
+    
+    def _wait_for_start(self, group_name, process):
+        """
+        等待重启的进程完成启动
+        
+        新进程锁定并写入PID文件后立即返回，不必等满RESTART_CONFIRM_TIMEOUT秒；进程提前退出时也立即返回
+        
+        @param {str} group_name - 监控组名称
+        @param {subprocess.Popen} process - 新启动的进程
+        @returns {bool} 进程是否仍在运行
+        """
+        deadline = time.monotonic() + RESTART_CONFIRM_TIMEOUT
+        while True:
+            if process.poll() is not None:
+                return False
+            if utils.load_pid(group_name) == process.pid:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # 超时仍未写入PID文件，只要进程还在运行就认为启动成功
+                return True
+            try:
+                process.wait(timeout=min(0.05, remaining))
+            except subprocess.TimeoutExpired:
+                pass
+    
     def restart_process(self, group_name):
         """
         重启指定组的进程
@@ -233,10 +308,15 @@ class Watchdog:
             need_alert = True
             
             if group_name in self.processes:
-                last_check = self.processes[group_name].last_check_time
+                process_info = self.processes[group_name]
+                # 优先使用单调时钟计算间隔，不受系统时间调整影响；从状态文件加载后尚未检查过时使用记录的时间
+                if process_info.last_check_monotonic is not None:
+                    elapsed = time.monotonic() - process_info.last_check_monotonic
+                else:
+                    elapsed = (current_time - process_info.last_check_time).total_seconds()
                 # 如果最后检查时间是在最近60秒内，且状态是"已停止"
                 # 那么可能是正常启动过程中的状态检查，不需要告警
-                if (current_time - last_check).total_seconds() < 60:
+                if elapsed < 60:
                     self.logger.info(f"[正常状态] 进程 {group_name} 处于正常启动流程中，不发送告警")
                     need_alert = False
             
@@ -248,32 +328,25 @@ class Watchdog:
                 self.processes[group_name].was_restarted = True
             
             # 执行启动命令
-            project_root = utils.get_project_root()
-            script_path = os.path.join(project_root, 'bin', f'monitor_{group_name}.py')
-            
             self.logger.info(f"[系统操作] 正在重启 {group_name} 监控进程...")
             
             # 使用 Python 解释器执行脚本
             python_executable = sys.executable
-            cmd = [python_executable, script_path]
+            cmd = [python_executable, self._script_path, '--group', group_name]
             
             # 在后台启动进程
-            with open(os.devnull, 'w') as devnull:
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=devnull,
-                    stderr=devnull,
-                    start_new_session=True,
-                    cwd=project_root
-                )
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+                cwd=utils.PROJECT_ROOT
+            )
             
             self.logger.info(f"[系统操作] 已重启进程 {group_name}，新PID: {process.pid}")
             
-            # 等待片刻确认进程已启动
-            time.sleep(2)
-            
             # 检查进程是否成功启动
-            restart_success = utils.is_process_running(process.pid)
+            restart_success = self._wait_for_start(group_name, process)
             
             # 设置一个标志，指示这次重启是否应该触发告警
             # 将这个标志保存在进程信息中
@@ -286,109 +359,145 @@ class Watchdog:
             self.logger.error(f"[系统错误] 重启进程 {group_name} 失败: {str(e)}")
             return False
     
-    def check_all_processes(self):
+    def _check_and_recover(self, group_name):
         """
-        检查所有监控组的进程状态
-        """
-        self.logger.info("[系统操作] 开始检查所有进程状态")
+        检查单个监控组的进程状态，必要时重启并发送告警
         
-        status_summary = []
+        各组只修改自己的进程信息，可以在多个线程中同时执行
         
-        for group_name in self.groups:
-            try:
-                is_running = self.check_process(group_name)
+        @param {str} group_name - 监控组名称
+        @returns {str|None} 状态总结，不需要记录时返回None
+        """
+        summary = None
+        try:
+            is_running = self.check_process(group_name)
+            
+            if not is_running:
+                # 获取进程信息
+                process_info = self.processes.get(group_name)
                 
-                if not is_running:
-                    # 获取进程信息
-                    process_info = self.processes.get(group_name)
-                    
-                    # 如果进程被标记为手动停止，则跳过后续的重启和告警处理
-                    if process_info and process_info.status == "已手动停止":
-                        self.logger.info(f"[正常状态] 进程 {group_name} 为正常的停止状态，无需操作")
-                        status_summary.append(f"{group_name}[已停止-正常]")
-                        continue
+                # 如果进程被标记为手动停止，则跳过后续的重启和告警处理
+                if process_info and process_info.status == "已手动停止":
+                    self.logger.info(f"[正常状态] 进程 {group_name} 为正常的停止状态，无需操作")
+                    return f"{group_name}[已停止-正常]"
+                
+                self.logger.info(f"[系统状态] 检测到进程 {group_name} 未运行")
+                
+                # 检查是否超过最大重启次数
+                if process_info and process_info.restart_count >= self.max_restarts:
+                    # 记录更详细的进程状态信息，帮助诊断
+                    self.logger.error(
+                        f"[系统警告] 进程 {group_name} 超过最大重启次数 {self.max_restarts}，"
+                        f"当前重启次数: {process_info.restart_count}，"
+                        f"最后检查时间: {process_info.last_check_time}，"
+                        f"最后启动时间: {process_info.last_start_time}，"
+                        f"当前状态: {process_info.status}"
+                    )
                     
-                    self.logger.info(f"[系统状态] 检测到进程 {group_name} 未运行")
+                    # 添加更明确的状态
+                    self.processes[group_name].status = "已停止 - 超过最大重启次数"
+                    summary = f"{group_name}[已停止-失败]"
                     
-                    # 检查是否超过最大重启次数
-                    if process_info and process_info.restart_count >= self.max_restarts:
-                        # 记录更详细的进程状态信息，帮助诊断
-                        self.logger.error(
-                            f"[系统警告] 进程 {group_name} 超过最大重启次数 {self.max_restarts}，"
-                            f"当前重启次数: {process_info.restart_count}，"
-                            f"最后检查时间: {process_info.last_check_time}，"
-                            f"最后启动时间: {process_info.last_start_time}，"
-                            f"当前状态: {process_info.status}"
-                        )
+                    message = alerter.format_process_alert_message(
+                        group_name,
+                        process_info.pid,
+                        "已停止 - 超过最大重启次数",
+                        restart_attempt=process_info.restart_count
+                    )
+                    self._pending_alerts.append((message, 'error'))
+                else:
+                    # 只有当进程需要告警时才尝试重启
+                    if process_info and process_info.need_alert:
+                        # 尝试重启
+                        restart_result = self.restart_process(group_name)
+                        self.last_check_restarted = True
                         
-                        # 添加更明确的状态
-                        self.processes[group_name].status = "已停止 - 超过最大重启次数"
-                        status_summary.append(f"{group_name}[已停止-失败]")
+                        # 获取更新后的进程信息
+                        updated_process_info = self.processes.get(group_name)
                         
-                        message = alerter.format_process_alert_message(
-                            group_name,
-                            process_info.pid,
-                            "已停止 - 超过最大重启次数",
-                            restart_attempt=process_info.restart_count
-                        )
-                        if self.alerter:
-                            self.alerter.send_alert(message, 'error', alert_type='process')
-                    else:
-                        # 只有当进程需要告警时才尝试重启
-                        if process_info and process_info.need_alert:
-                            # 尝试重启
-                            restart_result = self.restart_process(group_name)
-                            
-                            # 获取更新后的进程信息
-                            updated_process_info = self.processes.get(group_name)
-                            
-                            # 只有当进程真正需要告警时才发送
-                            if restart_result and updated_process_info and updated_process_info.need_alert:
-                                self.logger.info(f"[系统状态] 进程 {group_name} 重启成功并已发送告警")
-                                message = alerter.format_process_alert_message(
-                                    group_name,
-                                    updated_process_info.pid,
-                                    "已自动重启",
-                                    restart_attempt=updated_process_info.restart_count
-                                )
-                                if self.alerter:
-                                    self.logger.info(f"[系统操作] 为进程 {group_name} 发送告警通知")
-                                    self.alerter.send_alert(message, 'warning', alert_type='process')
-                            elif not restart_result:
-                                # 重启失败总是需要告警
-                                message = alerter.format_process_alert_message(
-                                    group_name,
-                                    process_info.pid if process_info else None,
-                                    "重启失败",
-                                    restart_attempt=process_info.restart_count if process_info else 1
-                                )
-                                if self.alerter:
-                                    self.alerter.send_alert(message, 'warning', alert_type='process')
-                            else:
-                                self.logger.info(f"[正常状态] 进程 {group_name} 重启成功但不需要告警（可能是正常启动流程）")
-                                status_summary.append(f"{group_name}[已重启-正常]")
+                        # 只有当进程真正需要告警时才发送
+                        if restart_result and updated_process_info and updated_process_info.need_alert:
+                            self.logger.info(f"[系统状态] 进程 {group_name} 重启成功并已发送告警")
+                            message = alerter.format_process_alert_message(
+                                group_name,
+                                updated_process_info.pid,
+                                "已自动重启",
+                                restart_attempt=updated_process_info.restart_count
+                            )
+                            if self.alerter:
+                                self.logger.info(f"[系统操作] 为进程 {group_name} 发送告警通知")
+                                self._pending_alerts.append((message, 'warning'))
+                        elif not restart_result:
+                            # 重启失败总是需要告警
+                            message = alerter.format_process_alert_message(
+                                group_name,
+                                process_info.pid if process_info else None,
+                                "重启失败",
+                                restart_attempt=process_info.restart_count if process_info else 1
+                            )
+                            self._pending_alerts.append((message, 'warning'))
                         else:
-                            self.logger.info(f"[正常状态] 进程 {group_name} 当前为已停止状态（正常），无需重启")
-                            status_summary.append(f"{group_name}[已停止-正常]")
-                else:
-                    status_summary.append(f"{group_name}[运行中]")
-            
-            except Exception as e:
-                self.logger.error(f"[系统错误] 检查进程 {group_name} 状态时出错: {str(e)}")
-                status_summary.append(f"{group_name}[检查失败]")
+                            self.logger.info(f"[正常状态] 进程 {group_name} 重启成功但不需要告警（可能是正常启动流程）")
+                            summary = f"{group_name}[已重启-正常]"
+                    else:
+                        self.logger.info(f"[正常状态] 进程 {group_name} 当前为已停止状态（正常），无需重启")
+                        summary = f"{group_name}[已停止-正常]"
+            else:
+                summary = f"{group_name}[运行中]"
+        
+        except Exception as e:
+            self.logger.error(f"[系统错误] 检查进程 {group_name} 状态时出错: {str(e)}")
+            summary = f"{group_name}[检查失败]"
+        
+        return summary
+    
+    def check_all_processes(self):
+        """
+        检查所有监控组的进程状态
+        """
+        self.logger.info("[系统操作] 开始检查所有进程状态")
+        
+        status_summary = []
+        self.last_check_restarted = False
+        self._pending_alerts = []
         
-        # 保存进程状态
-        self.save_state()
+        # 各组的检查互不影响，并行执行，一个组的重启等待不会拖慢其他组的检查
+        if self.groups:
+            with ThreadPoolExecutor(max_workers=min(32, len(self.groups))) as executor:
+                status_summary = [summary for summary in executor.map(self._check_and_recover, self.groups) if summary]
+        
+        # 多个组同时异常时，告警在同一时刻进入告警队列，由后台线程按级别合并为一条发送
+        if self.alerter:
+            for message, level in self._pending_alerts:
+                self.alerter.send_alert(message, level, alert_type='process')
+        self._pending_alerts = []
+        
+        # 保存进程状态，只有检查时间变化时跳过写入，但最多连续跳过STATE_SAVE_MAX_SKIPS轮
+        state_key = {group: process.state_key() for group, process in self.processes.items()}
+        if state_key != self._saved_state_key or self._skipped_saves >= STATE_SAVE_MAX_SKIPS:
+            if self.save_state():
+                self._saved_state_key = state_key
+                self._skipped_saves = 0
+        else:
+            self._skipped_saves += 1
         
         # 添加状态总结日志
-        if status_summary:
-            self.logger.info(f"[系统状态] 监控进程当前状态: {', '.join(status_summary)}")
+        if status_summary and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("[系统状态] 监控进程当前状态: %s", ', '.join(status_summary))
         
         self.logger.info("[系统操作] 完成检查所有进程状态")
         
         # 返回调用者是否应该继续
         return self.running
     
+    def running_pids(self):
+        """
+        获取最近一次检查中处于运行状态的监控进程PID
+        
+        @returns {set} 运行中的监控进程PID集合
+        """
+        return {info.pid for info in self.processes.values() if info.pid and info.status == "运行中"}
+    
     def monitor(self):
         """
         开始监控所有进程 - 此方法保留用于兼容性，但现在在bin/watchdog.py中直接使用check_all_processes
@@ -416,22 +525,12 @@ class Watchdog:
         self.logger.info("[系统操作] 停止进程监控")
 
 
-def create_watchdog(config=None):
+def _init_logger(project_root):
     """
-    创建并配置监控器
+    配置watchdog日志器的文件和控制台处理器
     
-    @param {dict} config - 配置信息
-    @returns {Watchdog} 配置好的监控器实例
+    @param {str} project_root - 项目根目录
     """
-    if config is None:
-        try:
-            config = utils.load_global_config()
-        except Exception as e:
-            print(f"[系统错误] 加载全局配置失败: {str(e)}")
-            config = {}
-    
-    # 设置日志
-    project_root = utils.get_project_root()
     logs_dir = os.path.join(project_root, 'logs', 'watchdog')
     os.makedirs(logs_dir, exist_ok=True)
     
@@ -460,6 +559,28 @@ def create_watchdog(config=None):
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
     logger.addHandler(console_handler)
+
+
+def create_watchdog(config=None):
+    """
+    创建并配置监控器
+    
+    @param {dict} config - 配置信息
+    @returns {Watchdog} 配置好的监控器实例
+    """
+    if config is None:
+        try:
+            config = utils.load_global_config()
+        except Exception as e:
+            print(f"[系统错误] 加载全局配置失败: {str(e)}")
+            config = {}
+    
+    # 设置日志(只在第一次创建监控器时配置)
+    global _logger_initialized
+    if not _logger_initialized:
+        _init_logger(utils.get_project_root())
+        _logger_initialized = True
+    logger = logging.getLogger("watchdog")
     
     # 如果存在watchdog专用的配置，创建新的配置字典
     watchdog_config = config.copy()